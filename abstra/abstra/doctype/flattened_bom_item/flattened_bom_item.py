@@ -0,0 +1,13 @@
+# Copyright (c) 2026, Abdul Mannan and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class FlattenedBOMItem(Document):
+    pass
+
+
+def on_doctype_update():
+    frappe.db.add_index("Flattened BOM Item", ["root_bom", "is_leaf", "item_code"])
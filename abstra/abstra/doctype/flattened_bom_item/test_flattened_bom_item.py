@@ -0,0 +1,123 @@
+# Copyright (c) 2026, Abdul Mannan and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from abstra.abstra.doctype.flattened_bom_item.flattened_bom_item import (
+    on_doctype_update,
+)
+from abstra.planning.flattened_bom import (
+    FLATTENED_BOM_FIELDS,
+    ensure_flattened_boms,
+    get_bom_closure,
+    update_flattened_bom,
+)
+
+
+def bom_row(item_code, stock_qty, sub_bom=None, parent_bom_qty=1, do_not_explode=0):
+    return frappe._dict(
+        item_code=item_code,
+        value=sub_bom,
+        stock_qty=stock_qty,
+        parent_bom_qty=parent_bom_qty,
+        do_not_explode=do_not_explode,
+        stock_uom="Nos",
+    )
+
+
+class TestFlattenedBOMItem(FrappeTestCase):
+    def test_closure_multiplies_quantities_down_the_tree(self):
+        bom_children = {
+            "BOM-A": [bom_row("SUB-B", 2, "BOM-B"), bom_row("RM-C", 1)],
+            # BOM-B makes 2 units
+            "BOM-B": [bom_row("RM-D", 6, parent_bom_qty=2)],
+        }
+
+        closure = get_bom_closure("BOM-A", bom_children, {})
+
+        self.assertEqual(
+            dict(closure),
+            {
+                ("SUB-B", "BOM-B", 0, 0, "Nos"): 2,
+                ("RM-C", None, 0, 1, "Nos"): 1,
+                ("RM-D", None, 1, 1, "Nos"): 6,
+            },
+        )
+
+    def test_closure_shares_memoized_sub_boms(self):
+        bom_children = {
+            "BOM-A": [bom_row("SUB-B", 1, "BOM-B"), bom_row("SUB-C", 1, "BOM-C")],
+            "BOM-B": [bom_row("SUB-D", 2, "BOM-D")],
+            "BOM-C": [bom_row("SUB-D", 3, "BOM-D")],
+            "BOM-D": [bom_row("RM-E", 1)],
+        }
+        memo = {}
+
+        closure = get_bom_closure("BOM-A", bom_children, memo)
+
+        self.assertEqual(closure[("RM-E", None, 2, 1, "Nos")], 5)
+        self.assertIn("BOM-D", memo)
+
+    def test_do_not_explode_keeps_sub_assembly_as_leaf(self):
+        bom_children = {
+            "BOM-A": [bom_row("SUB-B", 2, "BOM-B", do_not_explode=1)],
+            "BOM-B": [bom_row("RM-C", 1)],
+        }
+
+        closure = get_bom_closure("BOM-A", bom_children, {})
+
+        self.assertEqual(dict(closure), {("SUB-B", None, 0, 1, "Nos"): 2})
+
+    def test_closure_stops_at_a_cycle(self):
+        bom_children = {
+            "BOM-A": [bom_row("SUB-B", 1, "BOM-B")],
+            "BOM-B": [bom_row("SUB-A", 1, "BOM-A"), bom_row("RM-C", 1)],
+        }
+
+        closure = get_bom_closure("BOM-A", bom_children, {})
+
+        self.assertEqual(closure[("RM-C", None, 1, 1, "Nos")], 1)
+
+    def test_unflattened_boms_are_reported(self):
+        with (
+            patch("frappe.get_all", return_value=["BOM-A"]),
+            patch("abstra.planning.flattened_bom.explode_bom_trees", return_value={}),
+            patch(
+                "abstra.planning.flattened_bom.update_flattened_bom",
+                side_effect=lambda bom_no, *args: bom_no != "BOM-DRAFT",
+            ),
+        ):
+            self.assertEqual(
+                ensure_flattened_boms(["BOM-A", "BOM-B", "BOM-DRAFT"]), {"BOM-DRAFT"}
+            )
+
+    def test_bom_without_components_keeps_a_marker_row(self):
+        with (
+            patch("frappe.db.delete"),
+            patch(
+                "frappe.db.get_value",
+                return_value=frappe._dict(item="FG", docstatus=1, is_active=1),
+            ),
+            patch("abstra.planning.flattened_bom.explode_bom_tree", return_value={}),
+            patch("frappe.db.bulk_insert") as bulk_insert,
+        ):
+            self.assertTrue(update_flattened_bom("BOM-EMPTY"))
+
+        _doctype, fields, values = bulk_insert.call_args.args
+        (row,) = [dict(zip(fields, value, strict=True)) for value in values]
+        self.assertEqual(
+            (row["root_bom"], row["item_code"], row["qty_per_unit"]),
+            ("BOM-EMPTY", None, 0),
+        )
+        self.assertEqual(fields, FLATTENED_BOM_FIELDS)
+
+    def test_requirement_lookups_have_a_composite_index(self):
+        with patch("frappe.db.add_index") as add_index:
+            on_doctype_update()
+
+        add_index.assert_called_once_with(
+            "Flattened BOM Item", ["root_bom", "is_leaf", "item_code"]
+        )
@@ -0,0 +1,109 @@
+# Copyright (c) 2026, Abdul Mannan and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from abstra.planning.flattened_bom import get_bom_creator_closure
+from abstra.planning.where_used import get_where_used, get_where_used_rows
+
+
+def creator_row(name, item_code, qty, fg_reference_id=None):
+    return frappe._dict(
+        name=name,
+        item_code=item_code,
+        fg_reference_id=fg_reference_id,
+        qty=qty,
+        stock_qty=qty,
+        stock_uom="Nos",
+    )
+
+
+def flattened_row(item_code, level, qty, root_bom=None, bom_creator=None):
+    return frappe._dict(
+        root_bom=root_bom,
+        bom_creator=bom_creator,
+        root_item="FG",
+        item_code=item_code,
+        level=level,
+        qty_per_unit=qty,
+    )
+
+
+class TestWhereUsed(FrappeTestCase):
+    def test_bom_creator_closure_follows_row_references(self):
+        rows = [
+            creator_row("row-1", "SUB-A", 2),
+            creator_row("row-2", "RM-B", 3, fg_reference_id="row-1"),
+        ]
+
+        closure = get_bom_creator_closure(2, rows)
+
+        self.assertEqual(
+            dict(closure),
+            {("SUB-A", None, 0, 0, "Nos"): 1, ("RM-B", None, 1, 1, "Nos"): 1.5},
+        )
+
+    def test_usage_rows_name_the_bom_or_bom_creator(self):
+        rows = get_where_used_rows(
+            [
+                flattened_row("RM-A", 1, 1.5, bom_creator="BOM-CREATOR-1"),
+                flattened_row("RM-A", 1, 4, root_bom="BOM-FG"),
+                flattened_row("RM-A", 0, 2, root_bom="BOM-FG"),
+            ]
+        )
+
+        self.assertEqual(
+            [(d.reference_doctype, d.reference_name, d.level) for d in rows],
+            [
+                ("BOM", "BOM-FG", 0),
+                ("BOM", "BOM-FG", 1),
+                ("BOM Creator", "BOM-CREATOR-1", 1),
+            ],
+        )
+
+    def test_where_used_requires_bom_read_permission(self):
+        with (
+            patch("frappe.has_permission", side_effect=frappe.PermissionError),
+            patch("abstra.planning.where_used.get_flattened_usage") as get_usage,
+        ):
+            with self.assertRaises(frappe.PermissionError):
+                get_where_used("RM-A")
+
+        get_usage.assert_not_called()
+
+    def test_where_used_lists_only_readable_documents(self):
+        readable = {"BOM-FG", "PM-1", "PP-2"}
+
+        def get_permitted_names(doctype, names):
+            return sorted(set(names) & readable)
+
+        with (
+            patch("frappe.has_permission", return_value=True),
+            patch(
+                "abstra.planning.where_used.get_flattened_usage",
+                return_value=[
+                    flattened_row("RM-A", 1, 4, root_bom="BOM-FG"),
+                    flattened_row("RM-A", 1, 2, root_bom="BOM-HIDDEN"),
+                    flattened_row("RM-A", 0, 1, bom_creator="BOM-CREATOR-1"),
+                ],
+            ),
+            patch(
+                "abstra.planning.where_used.get_permitted_names",
+                side_effect=get_permitted_names,
+            ),
+            patch(
+                "abstra.planning.where_used.get_documents_using_boms",
+                return_value=(["PM-1", "PM-2"], ["PP-1", "PP-2"]),
+            ) as get_documents,
+        ):
+            result = get_where_used("RM-A")
+
+        get_documents.assert_called_once_with(["BOM-FG"])
+        self.assertEqual(result["boms"], ["BOM-FG"])
+        self.assertEqual(result["bom_creators"], [])
+        self.assertEqual(result["project_masters"], ["PM-1"])
+        self.assertEqual(result["production_plans"], ["PP-2"])
+        self.assertEqual([d.reference_name for d in result["usage"]], ["BOM-FG"])
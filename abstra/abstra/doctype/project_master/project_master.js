@@ -111,6 +111,25 @@ frappe.ui.form.on("Project Master", {
 		});
 	},
 
+	auto_nest_items: function (frm) {
+		if (!frm.doc.sheet_name) {
+			frappe.msgprint(__("Please select the Sheet Name to nest on"));
+			return;
+		}
+
+		frm.dirty();
+		frappe.call({
+			method: "auto_nest_items",
+			freeze: true,
+			freeze_message: __("Nesting items..."),
+			doc: frm.doc,
+			callback: function () {
+				frm.refresh();
+				toggle_add_nesting_button(frm);
+			},
+		});
+	},
+
 	add_nesting_details: function (frm) {
 		frm.dirty();
 
@@ -430,6 +449,7 @@ frappe.ui.form.on("Project Master", {
 			method: "get_sub_assembly_items",
 			freeze: true,
 			doc: frm.doc,
+			args: { incremental: frm.doc.reuse_sub_assembly_rows ? 1 : 0 },
 			callback: function () {
 				frm.trigger("get_items_for_mr")
 				refresh_field("sub_assembly_items");
@@ -503,40 +523,221 @@ frappe.ui.form.on("Project Master", {
 	},
 
 	get_items_for_material_requests(frm, warehouses) {
+		if (frm.doc.get_items_in_background) {
+			frm.events.enqueue_items_for_material_requests(frm, warehouses);
+			return;
+		}
+
+		// a saved plan is refreshed in place: only changed rows come back
+		if (!frm.is_new() && !frm.is_dirty() && (frm.doc.mr_items || []).length) {
+			frappe.call({
+				method: "abstra.abstra.doctype.project_master.project_master.get_mr_item_changes",
+				freeze: true,
+				args: {
+					...frm.events.get_planning_args(frm),
+					warehouses: warehouses || [],
+				},
+				callback: function (r) {
+					if (r.message) {
+						frm.events.apply_mr_item_changes(frm, r.message);
+					}
+				},
+			});
+			return;
+		}
+
 		frappe.call({
 			method: "abstra.abstra.doctype.project_master.project_master.get_items_for_material_requests",
 			freeze: true,
 			args: {
-				doc: frm.doc,
+				...frm.events.get_planning_args(frm),
 				warehouses: warehouses || [],
 			},
 			callback: function (r) {
-				if (r.message) {
-					frm.set_value("mr_items", []);
-					r.message.forEach((row) => {
-						let d = frm.add_child("mr_items");
-						for (let field in row) {
-							if (field !== "name") {
-								d[field] = row[field];
-							}
-						}
-					});
+				frm.events.set_mr_items(frm, r.message);
+			},
+		});
+	},
+
+	enqueue_items_for_material_requests(frm, warehouses) {
+		const method = "abstra.abstra.doctype.project_master.project_master";
+		const title = __("Getting Items for Material Request");
+		let input_hash = null;
+		let early_done = [];
+		let finished = false;
+		let poll = null;
+
+		const finish = () => {
+			if (finished) return false;
+			finished = true;
+			frappe.realtime.off("abstra_mr_items_progress", on_progress);
+			frappe.realtime.off("abstra_mr_items_done", on_done);
+			clearInterval(poll);
+			frappe.hide_progress();
+			return true;
+		};
+
+		const set_result = (items) => {
+			if (items != null && finish()) {
+				frm.events.set_mr_items(frm, items);
+			}
+		};
+
+		const fetch_result = () => {
+			frappe.call({
+				method: `${method}.get_items_for_material_requests_result`,
+				args: { name: frm.doc.name, input_hash: input_hash },
+				callback: (r) => set_result(r.message),
+			});
+		};
+
+		const on_progress = (data) => {
+			if (finished || data.name !== frm.doc.name || data.input_hash !== input_hash) return;
+			frappe.show_progress(title, data.progress, 100, data.stage);
+		};
+
+		const on_done = (data) => {
+			if (finished || data.name !== frm.doc.name) return;
+			if (input_hash === null) {
+				// the job finished before the enqueue call returned
+				early_done.push(data);
+				return;
+			}
+			if (data.input_hash !== input_hash) return;
+
+			if (data.status !== "Completed") {
+				if (finish()) {
+					frappe.msgprint(__("Getting items for Material Request failed. Check the Error Log."));
+				}
+				return;
+			}
+			fetch_result();
+		};
+
+		// listen before enqueueing, a quick job can publish before the call returns
+		frappe.realtime.on("abstra_mr_items_progress", on_progress);
+		frappe.realtime.on("abstra_mr_items_done", on_done);
+
+		frappe.call({
+			method: `${method}.enqueue_items_for_material_requests`,
+			args: {
+				...frm.events.get_planning_args(frm),
+				warehouses: warehouses || [],
+			},
+			callback: function (r) {
+				if (!r.message) {
+					finish();
+					return;
 				}
 
-				frm.dirty();
-				frappe.call({
-					method: "remove_add_sfa_raw_material",
-					freeze: true,
-					doc: frm.doc,
-				}).then((r) => {
-					frm.refresh_field("mr_items");
-					frm.refresh_field("sub_assembly_items");
-				});
-				frm.refresh_field("mr_items");
-				frm.refresh_field("sub_assembly_items");
+				input_hash = r.message.input_hash;
+				if (r.message.status === "Completed") {
+					set_result(r.message.items);
+					return;
+				}
 
+				frappe.show_progress(title, 0, 100, __("Queued"));
+				early_done.forEach(on_done);
+
+				// poll as well in case the done event is missed, until the result expires
+				let polls = 0;
+				poll = setInterval(() => {
+					if (++polls > 180) {
+						finish();
+						return;
+					}
+					fetch_result();
+				}, 10000);
 			},
+			error: () => finish(),
+		});
+	},
+
+	get_planning_args(frm) {
+		// the server reads the saved rows itself; only unsaved values are sent
+		if (frm.is_new()) {
+			return { doc: frm.doc };
+		}
+
+		const pick = (row, fields) => Object.fromEntries(fields.map((f) => [f, row[f]]));
+		const overrides = pick(frm.doc, [
+			"for_warehouse",
+			"ignore_existing_ordered_qty",
+			"include_safety_stock",
+			"include_non_stock_items",
+			"include_subcontracted_items",
+			"skip_available_sub_assembly_item",
+			"consider_minimum_order_qty",
+			"record_material_pegging",
+		]);
+
+		if (frm.is_dirty()) {
+			overrides.po_items = (frm.doc.po_items || []).map((row) =>
+				pick(row, ["name", "idx", "item_code", "bom_no", "planned_qty", "include_exploded_items"])
+			);
+			overrides.sub_assembly_items = (frm.doc.sub_assembly_items || []).map((row) =>
+				pick(row, ["name", "idx", "production_item", "bom_no", "qty", "type_of_manufacturing"])
+			);
+		}
+
+		return { name: frm.doc.name, overrides: overrides };
+	},
+
+	set_mr_items(frm, items) {
+		if (items) {
+			frm.set_value("mr_items", []);
+			items.forEach((row) => frm.events.add_mr_item(frm, row));
+		}
+
+		frm.events.after_mr_items_set(frm);
+	},
+
+	add_mr_item(frm, row) {
+		let d = frm.add_child("mr_items");
+		for (let field in row) {
+			if (field !== "name") {
+				d[field] = row[field];
+			}
+		}
+	},
+
+	apply_mr_item_changes(frm, changes) {
+		const deleted = new Set(changes.delete);
+		const updates = Object.fromEntries(changes.update.map((row) => [row.name, row]));
+
+		(frm.doc.mr_items || [])
+			.filter((row) => deleted.has(row.name))
+			.forEach((row) => frappe.model.clear_doc(row.doctype, row.name));
+		frm.doc.mr_items = (frm.doc.mr_items || []).filter((row) => !deleted.has(row.name));
+		frm.doc.mr_items.forEach((row) => {
+			if (updates[row.name]) {
+				Object.assign(row, updates[row.name]);
+			}
+		});
+		changes.insert.forEach((row) => frm.events.add_mr_item(frm, row));
+		frm.doc.mr_items.forEach((row, idx) => (row.idx = idx + 1));
+
+		// SFA items were already moved out on the server, only set the sub assemblies
+		frm.clear_table("sub_assembly_items");
+		changes.sub_assembly_items.forEach((row) => frm.add_child("sub_assembly_items", row));
+
+		frm.dirty();
+		frm.refresh_field("mr_items");
+		frm.refresh_field("sub_assembly_items");
+	},
+
+	after_mr_items_set(frm) {
+		frm.dirty();
+		frappe.call({
+			method: "remove_add_sfa_raw_material",
+			freeze: true,
+			doc: frm.doc,
+		}).then((r) => {
+			frm.refresh_field("mr_items");
+			frm.refresh_field("sub_assembly_items");
 		});
+		frm.refresh_field("mr_items");
+		frm.refresh_field("sub_assembly_items");
 	},
 
 	// download_materials_required(frm) {
@@ -3,14 +3,14 @@
 
 # import frappe
 
-import copy
+import hashlib
 import json
 from collections import defaultdict
 
 import frappe
 from frappe import _, msgprint
 from frappe.model.document import Document
-from frappe.query_builder.functions import IfNull, Sum
+from frappe.query_builder.functions import IfNull, Max, Sum
 from frappe.utils import (
     add_days,
     ceil,
@@ -25,14 +25,41 @@ from frappe.utils import (
 from frappe.utils.csvutils import build_csv_response
 from pypika.terms import ExistsCriterion
 
-from erpnext.manufacturing.doctype.bom.bom import get_children as get_bom_children
 from erpnext.manufacturing.doctype.bom.bom import validate_bom_no
 from erpnext.manufacturing.doctype.work_order.work_order import get_item_details
-from erpnext.setup.doctype.item_group.item_group import get_item_group_defaults
-from erpnext.stock.get_item_details import get_conversion_factor
 from erpnext.stock.utils import get_or_make_bin
 from erpnext.utilities.transaction_base import validate_uom_is_integer
 
+from abstra.planning.bom_cache import get_bom_creator_items, get_bom_creators
+from abstra.planning.bom_explosion import (
+    explode_bom_trees,
+    get_expandable_item_codes,
+    get_unit_subtree,
+)
+from abstra.planning.context import PlanningContext
+from abstra.planning.nesting import nest_parts
+from abstra.planning.pegging import (
+    PeggingCollector,
+    save_material_pegging,
+    set_mr_item_pegging,
+)
+from abstra.planning.raw_materials import (
+    add_to_item_details,
+    explode_raw_materials,
+    get_raw_material_rows,
+)
+from abstra.planning.sfa import classify_sfa_items
+from abstra.planning.stock_allocation import allocate_stock
+from abstra.planning.stock_netting import (
+    get_bin_snapshot,
+    get_item_bins,
+    get_projected_bins,
+    net_projected_qty,
+)
+from abstra.planning.sub_assembly_row import SubAssemblyRow
+from abstra.planning.uom import get_uom_conversion_factors
+from abstra.planning.warehouse_tree import get_subtree_warehouses
+
 
 class ProjectMaster(Document):
     # begin: auto-generated types
@@ -75,6 +102,7 @@ class ProjectMaster(Document):
         from_date: DF.Date | None
         from_delivery_date: DF.Date | None
         get_items_from: DF.Literal["", "Sales Order", "Material Request"]
+        get_items_in_background: DF.Check
         ignore_existing_ordered_qty: DF.Check
         include_non_stock_items: DF.Check
         include_safety_stock: DF.Check
@@ -87,6 +115,8 @@ class ProjectMaster(Document):
         posting_date: DF.Date
         prod_plan_references: DF.Table[ProductionPlanItemReference]
         project: DF.Link | None
+        record_material_pegging: DF.Check
+        reuse_sub_assembly_rows: DF.Check
         sales_order_status: DF.Literal[
             "", "To Deliver and Bill", "To Bill", "To Deliver"
         ]
@@ -504,11 +534,14 @@ class ProjectMaster(Document):
 
     def add_items(self, items):
         refs = {}
+        context = PlanningContext(self.company).load_items(
+            {data.item_code for data in items if data.pending_qty}
+        )
         for data in items:
             if not data.pending_qty:
                 continue
 
-            item_details = get_item_details(data.item_code, throw=False)
+            item_details = context.get_item_details(data.item_code)
             if self.combine_items:
                 bom_no = item_details.bom_no
                 if data.get("bom_no"):
@@ -1011,6 +1044,9 @@ class ProjectMaster(Document):
 
         frappe.flags.mute_messages = False
 
+        if material_request_list and self.get("record_material_pegging"):
+            save_material_pegging(self.name, self.mr_items)
+
         if material_request_list:
             material_request_list = [
                 get_link_to_form("Material Request", m.name)
@@ -1123,14 +1159,25 @@ class ProjectMaster(Document):
     #             self.set_default_supplier_for_subcontracting_order()
 
     @frappe.whitelist()
-    def get_sub_assembly_items(self, manufacturing_type=None):
-        """Fetch sub assembly items and optionally combine them."""
+    def get_sub_assembly_items(self, manufacturing_type=None, incremental=False):
+        """Fetch sub assembly items and optionally combine them.
+
+        With `incremental`, po_items rows whose fingerprint is unchanged since
+        the last run, and whose BOMs and items were not modified since, reuse
+        their exploded rows with a fresh `actual_qty`; only the other rows are
+        exploded.
+        """
         # ensure target is empty
         self.sub_assembly_items = []
 
+        # netting shares stock across rows, so a row can't be re-planned alone
+        incremental = cint(incremental) and not self.skip_available_sub_assembly_item
+        previous_snapshot = get_sub_assembly_snapshot(self.name) if incremental else {}
+        snapshot = {}
+
         # temporary store to process all subassembly items across all po_items
         sub_assembly_items_store = []
-        bin_details = frappe._dict()
+        subtree_memo = {}
 
         # track processed items to avoid duplicates
         processed_items = set()
@@ -1138,7 +1185,6 @@ class ProjectMaster(Document):
         # ensure message exists
         message = None
 
-        # iterate each production/assembly row and collect its BOM-derived sub-items
         for row in self.po_items:
             # validation: if skip_available_sub_assembly_item is checked then warehouse must be set
             if (
@@ -1166,33 +1212,94 @@ class ProjectMaster(Document):
                     )
                 )
 
-            # collect BOM data for this row
-            bom_data = []
-            # Note: this calls the global helper function named get_sub_assembly_items.
-            # If that conflicts with this method name, consider renaming the helper.
-            get_sub_assembly_items(
-                [item.production_item for item in sub_assembly_items_store],
-                bin_details,
-                row.bom_no,
-                bom_data,
-                row.planned_qty,
-                self.company,
-                warehouse=self.sub_assembly_warehouse,
-                skip_available_sub_assembly_item=self.skip_available_sub_assembly_item,
+        fingerprints = {
+            row.name: self.get_po_item_fingerprint(row, manufacturing_type)
+            for row in self.po_items
+        }
+        reusable = {
+            row.name
+            for row in self.po_items
+            if previous_snapshot.get(row.name, {}).get("fingerprint")
+            == fingerprints[row.name]
+            and previous_snapshot[row.name].get("dependencies")
+        }
+        if reusable:
+            versions = get_dependency_versions(
+                previous_snapshot[name]["dependencies"] for name in reusable
             )
+            reusable = {
+                name
+                for name in reusable
+                if is_dependency_current(
+                    previous_snapshot[name]["dependencies"], versions
+                )
+            }
 
-            # set fields based on BOM level / row
-            self.set_sub_assembly_items_based_on_level(
-                row, bom_data, manufacturing_type
-            )
+        reused_rows = {
+            name: [
+                SubAssemblyRow.from_tuple(values)
+                for values in previous_snapshot[name]["rows"]
+            ]
+            for name in reusable
+        }
+        rows_to_explode = {row.name for row in self.po_items} - reusable
+
+        # load every BOM tree and the bins of all sub-assemblies up front, so the
+        # per-row explosion and stock netting below are in-memory lookups
+        bom_children = explode_bom_trees(
+            [row.bom_no for row in self.po_items if row.name in rows_to_explode]
+        )
+        bin_details = get_projected_bins(
+            get_expandable_item_codes(bom_children)
+            | {d.production_item for rows in reused_rows.values() for d in rows},
+            self.company,
+            self.sub_assembly_warehouse,
+        )
+
+        # iterate each production/assembly row and collect its BOM-derived sub-items
+        for row in self.po_items:
+            if row.name in rows_to_explode:
+                # collect BOM data for this row
+                bom_data = []
+                # Note: this calls the global helper function named get_sub_assembly_items.
+                # If that conflicts with this method name, consider renaming the helper.
+                get_sub_assembly_items(
+                    bin_details,
+                    row.bom_no,
+                    bom_data,
+                    row.planned_qty,
+                    bom_children,
+                    skip_available_sub_assembly_item=self.skip_available_sub_assembly_item,
+                    subtree_memo=subtree_memo,
+                )
+
+                # set fields based on BOM level / row
+                self.set_sub_assembly_items_based_on_level(
+                    row, bom_data, manufacturing_type
+                )
+            else:
+                # stock moves between runs, only the BOM structure is reused
+                bom_data = reused_rows[row.name]
+                for d in bom_data:
+                    bins = bin_details.get(d.production_item)
+                    d.actual_qty = bins[0].get("actual_qty", 0) if bins else 0
+
+            snapshot[row.name] = {
+                "fingerprint": fingerprints[row.name],
+                "rows": [d.as_tuple() for d in bom_data],
+                "dependencies": (
+                    previous_snapshot[row.name]["dependencies"]
+                    if row.name in reusable
+                    else {
+                        "BOM": {row.bom_no} | {d.bom_no for d in bom_data if d.bom_no},
+                        "Item": {row.item_code} | {d.production_item for d in bom_data},
+                    }
+                ),
+            }
 
             # add unique bom_data items to the store
             for item in bom_data:
-                item_key = (
-                    item.get("production_item"),
-                    item.get("bom_no"),
-                    item.get("parent_item_code"),
-                )
+                item_key = (item.production_item, item.bom_no, item.parent_item_code)
                 if item_key not in processed_items:
                     sub_assembly_items_store.append(item)
                     processed_items.add(item_key)
@@ -1221,29 +1328,58 @@ class ProjectMaster(Document):
 
         # append collected sub-assembly items to the document
         for idx, item_row in enumerate(sub_assembly_items_store):
-            # ensure each appended row has an idx and is a proper dict/doc-like object
+            # rows are compact records up to here, only now become child row dicts
             item_row.idx = idx + 1
-            self.append("sub_assembly_items", item_row)
+            self.append("sub_assembly_items", item_row.as_dict())
 
         # finally, set default supplier for subcontract items if missing
         self.set_default_supplier_for_subcontracting_order()
 
+        if incremental:
+            # record the `modified` the freshly exploded rows were built from
+            versions = get_dependency_versions(
+                snapshot[name]["dependencies"] for name in rows_to_explode
+            )
+            for name in rows_to_explode:
+                snapshot[name]["dependencies"] = {
+                    doctype: {
+                        doc_name: versions.get(doctype, {}).get(doc_name)
+                        for doc_name in doc_names
+                    }
+                    for doctype, doc_names in snapshot[name]["dependencies"].items()
+                }
+
+            set_sub_assembly_snapshot(self.name, snapshot)
+
+    def get_po_item_fingerprint(self, row, manufacturing_type=None):
+        """Everything a po_items row's exploded sub-assembly rows depend on."""
+        return (
+            row.item_code,
+            row.bom_no,
+            flt(row.planned_qty),
+            row.warehouse,
+            str(row.planned_start_date or ""),
+            manufacturing_type,
+            self.company,
+            self.sub_assembly_warehouse,
+        )
+
     def combine_subassembly_items(self, sub_assembly_items_store):
         "Aggregate if same: Item, Warehouse, Inhouse/Outhouse Manu.g, BOM No."
         key_wise_data = {}
         for row in sub_assembly_items_store:
             key = (
-                row.get("production_item"),
-                row.get("fg_warehouse"),
-                row.get("bom_no"),
-                row.get("type_of_manufacturing"),
+                row.production_item,
+                row.fg_warehouse,
+                row.bom_no,
+                row.type_of_manufacturing,
                 # CHANGED: Added parent_item_code to key
-                row.get("parent_item_code"),
+                row.parent_item_code,
             )
             if key not in key_wise_data:
-                # initialize (item, wh, bom no, man.g type, parent) wise dict
-                # CHANGED: Use deepcopy to avoid reference issues
-                key_wise_data[key] = copy.deepcopy(row)
+                # initialize (item, wh, bom no, man.g type, parent) wise row; the
+                # store rows are owned by this run, so the first one is merged into
+                key_wise_data[key] = row
             else:
                 # if row with same key exists, merge quantities
                 existing_row = key_wise_data[key]
@@ -1272,21 +1408,23 @@ class ProjectMaster(Document):
                 else:
                     data.type_of_manufacturing = "In House"
 
-            if data.type_of_manufacturing == "Subcontract":
-                data.supplier = data.supplier or frappe.db.get_value(
-                    "Item Default",
-                    {"parent": data.production_item, "company": self.company},
-                    "default_supplier",
-                )
+        # suppliers of subcontracted rows are filled for all rows at once in
+        # set_default_supplier_for_subcontracting_order
 
     def set_default_supplier_for_subcontracting_order(self):
-        for row in self.sub_assembly_items:
-            if row.type_of_manufacturing == "Subcontract" and not row.supplier:
-                row.supplier = frappe.db.get_value(
-                    "Item Default",
-                    {"parent": row.production_item, "company": self.company},
-                    "default_supplier",
-                )
+        rows = [
+            row
+            for row in self.sub_assembly_items
+            if row.type_of_manufacturing == "Subcontract" and not row.supplier
+        ]
+        if not rows:
+            return
+
+        default_suppliers = get_default_suppliers(
+            {row.production_item for row in rows}, self.company
+        )
+        for row in rows:
+            row.supplier = default_suppliers.get(row.production_item)
 
     def all_items_completed(self):
         for d in self.po_items:
@@ -1299,76 +1437,73 @@ class ProjectMaster(Document):
     def get_nesting_details_item(self):
         self.nesting_item_details = []
 
-        def find_bom(item_code, parent_item_code=None, checked_pairs=None):
-            if checked_pairs is None:
-                checked_pairs = set()
-            if not item_code:
-                return None
-
-            current_pair = (item_code, parent_item_code)
-            if current_pair in checked_pairs:
-                return None
-            checked_pairs.add(current_pair)
-
-            row_bom = next(
-                (
-                    row.bom_no
-                    for row in self.sub_assembly_items
-                    if row.production_item == item_code and row.bom_no
-                ),
-                None,
-            )
-            if row_bom:
-                return row_bom
-
-            # 2️⃣ Find parent item of this item in the same table
-            parent_item_code_next = next(
-                (
-                    row.parent_item_code
-                    for row in self.sub_assembly_items
-                    if row.production_item == item_code
-                ),
-                None,
-            )
-
-            # 3️⃣ If a parent exists, recurse upward
-            if parent_item_code_next:
-                return find_bom(
-                    parent_item_code_next, parent_item_code_next, checked_pairs
-                )
-
-            # 4️⃣ As a last fallback (no row found), query DB
-            bom_no = frappe.db.get_value(
-                "BOM", {"item": item_code, "is_active": 1}, "name"
-            )
-            return bom_no
-
-            # ---- Main Loop ----
-
+        # production_item -> bom_no / parent_item_code of its first row
+        bom_index, parent_index = {}, {}
+        for row in self.sub_assembly_items:
+            if row.bom_no:
+                bom_index.setdefault(row.production_item, row.bom_no)
+            parent_index.setdefault(row.production_item, row.parent_item_code)
+
+        def find_bom(item_code):
+            """Walk up the parents of `item_code` to the first one with a BOM.
+
+            Returns (bom_no, None), or (None, item_code) when the walk ends at
+            an item outside the table whose active BOM has to be looked up.
+            """
+            visited = set()
+            while item_code and item_code not in visited:
+                visited.add(item_code)
+                if item_code in bom_index:
+                    return bom_index[item_code], None
+
+                parent_item_code = parent_index.get(item_code)
+                if not parent_item_code:
+                    return None, item_code
+                item_code = parent_item_code
+
+            return None, None
+
+        rows = []
+        active_bom_items = set()
         for item in self.sub_assembly_items:
-            custom_weight = 0
-            qty = 0
+            bom_no, lookup_item = item.bom_no, None
+            if not bom_no:
+                bom_no, lookup_item = find_bom(item.production_item)
+                if lookup_item:
+                    active_bom_items.add(lookup_item)
+            rows.append((item, bom_no, lookup_item))
+
+        active_boms = {}
+        if active_bom_items:
+            for d in frappe.get_all(
+                "BOM",
+                filters={"item": ("in", list(active_bom_items)), "is_active": 1},
+                fields=["name", "item"],
+                order_by="modified desc",
+            ):
+                active_boms.setdefault(d.item, d.name)
 
-            bom_no = item.bom_no or find_bom(
-                item.production_item, item.parent_item_code
+        bom_nos = {
+            bom_no or active_boms.get(lookup_item)
+            for _item, bom_no, lookup_item in rows
+        }
+        bom_creators = get_bom_creators(bom_nos)
+
+        # (bom_creator, item_code, fg_item) -> first BOM Creator Item row
+        weights = {}
+        for bom_creator, creator_items in get_bom_creator_items(
+            bom_creators.values()
+        ).items():
+            for d in creator_items:
+                weights.setdefault((bom_creator, d.item_code, d.fg_item), d)
+
+        for item, bom_no, lookup_item in rows:
+            bom_creator = bom_creators.get(bom_no or active_boms.get(lookup_item))
+            row = weights.get(
+                (bom_creator, item.production_item, item.parent_item_code)
             )
-
-            if bom_no:
-                bom_creator = frappe.db.get_value("BOM", bom_no, "bom_creator")
-                if bom_creator:
-                    row = frappe.db.get_value(
-                        "BOM Creator Item",
-                        {
-                            "parent": bom_creator,
-                            "item_code": item.production_item,
-                            "fg_item": item.parent_item_code,
-                        },
-                        ["custom_blwt", "qty"],
-                        as_dict=True,
-                    )
-                    if row:
-                        custom_weight = row.custom_blwt or 0
-                        qty = row.qty or 0
+            custom_weight = (row and row.custom_blwt) or 0
+            qty = (row and row.qty) or 0
 
             if custom_weight and qty:
                 self.append(
@@ -1407,26 +1542,7 @@ class ProjectMaster(Document):
             },
         )
 
-        new_header.scrap_weight = round(
-            (new_header.sheet_weight or 0) - (total_weight or 0), 3
-        )
-        new_header.net_sheet_weight = round(
-            (new_header.nesting_qty or 0) * (new_header.sheet_weight or 0), 3
-        )
-        new_header.net_sub_assembly_weight = round(
-            (new_header.nesting_qty or 0) * (total_weight or 0), 3
-        )
-        new_header.net_scrap_weight = round(
-            (new_header.nesting_qty or 0) * (new_header.scrap_weight or 0), 3
-        )
-
-        if new_header.sheet_weight:
-            new_header.scrap_percentage = round(
-                (new_header.scrap_weight / new_header.sheet_weight) * 100, 3
-            )
-            new_header.utilization_percentage = round(
-                100 - new_header.scrap_percentage, 3
-            )
+        set_nesting_header_weights(new_header, total_weight)
 
         if round(
             (new_header.nesting_qty or 0) * (new_header.sheet_weight or 0), 3
@@ -1467,6 +1583,149 @@ class ProjectMaster(Document):
         self.sheet_weight = 0
         self.net_weight = 0
 
+        self.set_nesting_totals()
+
+    @frappe.whitelist()
+    def auto_nest_items(self, spacing=0, allow_rotation=1):
+        """Nest the pending `nesting_item_details` on `sheet_name` automatically.
+
+        Parts and sheet are rectangles from the Item `custom_length` and
+        `custom_width`; parts of another `custom_thickness` than the sheet are
+        left out. Each distinct sheet layout becomes one `nesting_header` row
+        cut `nesting_qty` times, with its parts in `nesting_items`.
+        """
+        if not self.sheet_name:
+            frappe.throw(_("Please select the Sheet Name to nest on"))
+
+        if not self.nesting_item_details:
+            self.get_nesting_details_item()
+
+        sheet = frappe.db.get_value(
+            "Item",
+            self.sheet_name,
+            ["custom_length", "custom_width", "custom_thickness", "custom_weight"],
+            as_dict=True,
+        )
+        if not (sheet and flt(sheet.custom_length) and flt(sheet.custom_width)):
+            frappe.throw(
+                _("Set the Length and Width of sheet {0}").format(
+                    get_link_to_form("Item", self.sheet_name)
+                )
+            )
+
+        sheet_area = flt(sheet.custom_length) * flt(sheet.custom_width)
+        pending_rows = [
+            row for row in self.nesting_item_details if flt(row.pending_qty) > 0
+        ]
+        item_dimensions = {
+            d.name: d
+            for d in frappe.get_all(
+                "Item",
+                filters={"name": ("in", list({row.item_code for row in pending_rows}))},
+                fields=["name", "custom_length", "custom_width", "custom_thickness"],
+            )
+        }
+
+        parts, skipped = {}, []
+        for idx, row in enumerate(pending_rows):
+            item = item_dimensions.get(row.item_code)
+            if (
+                not item
+                or not (flt(item.custom_length) and flt(item.custom_width))
+                or (
+                    flt(sheet.custom_thickness)
+                    and flt(item.custom_thickness)
+                    and flt(item.custom_thickness) != flt(sheet.custom_thickness)
+                )
+            ):
+                skipped.append(row.item_code)
+                continue
+
+            parts[idx] = (
+                flt(item.custom_length),
+                flt(item.custom_width),
+                ceil(flt(row.pending_qty)),
+            )
+
+        layouts, unplaced = nest_parts(
+            parts,
+            flt(sheet.custom_length),
+            flt(sheet.custom_width),
+            spacing=flt(spacing),
+            allow_rotation=cint(allow_rotation),
+        )
+
+        part_weights = {
+            # parts without a weight are cut from the sheet's own plate
+            idx: flt(pending_rows[idx].weight)
+            or (flt(sheet.custom_weight) * length * width / sheet_area)
+            for idx, (length, width, _qty) in parts.items()
+        }
+        layout_weights = get_layout_weights(
+            layouts, part_weights, flt(sheet.custom_weight)
+        )
+
+        prefix = self.nesting_no or self.name
+        for layout, total_weight in zip(layouts, layout_weights, strict=True):
+            header = self.append(
+                "nesting_header",
+                {
+                    "nesting_no": f"{prefix}-{len(self.nesting_header) + 1:03d}",
+                    "sheet_name": self.sheet_name,
+                    "nesting_qty": layout["sheets"],
+                    "sheet_weight": flt(sheet.custom_weight),
+                },
+            )
+
+            for idx, count in layout["counts"].items():
+                row = pending_rows[idx]
+                weight = part_weights[idx]
+                net_qty = count * layout["sheets"]
+                self.append(
+                    "nesting_items",
+                    {
+                        "item": row.item_code,
+                        "qty": count,
+                        "net_qty": net_qty,
+                        "weight": round(weight, 3),
+                        "net_weight": round(net_qty * weight, 3),
+                        "sheet_name": header.sheet_name,
+                        "nesting_no": header.nesting_no,
+                        "nesting_parent_ref": row.name,
+                        "nesting_header_ref": header.name,
+                        "surplus_qty": max(0, net_qty - flt(row.pending_qty)),
+                    },
+                )
+                row.pending_qty = max(0, flt(row.pending_qty) - net_qty)
+                row.qty = 0
+                row.net_qty = 0
+
+            header.sub_assembly_weight = round(total_weight, 3)
+            set_nesting_header_weights(header, total_weight)
+            if not header.sheet_weight:
+                # no sheet weight to take the parts from, only the area is known
+                header.scrap_weight = 0
+                header.net_scrap_weight = 0
+                header.utilization_percentage = round(
+                    layout["used_area"] / sheet_area * 100, 3
+                )
+                header.scrap_percentage = round(100 - header.utilization_percentage, 3)
+
+        self.set_nesting_totals()
+
+        skipped += [pending_rows[idx].item_code for idx in unplaced]
+        message = _("{0} sheets of {1} nested in {2} layouts").format(
+            sum(layout["sheets"] for layout in layouts),
+            self.sheet_name,
+            len(layouts),
+        )
+        if skipped:
+            message += "<br>" + _(
+                "Not nested (no size, other thickness or larger than the sheet): {0}"
+            ).format(comma_and(list(dict.fromkeys(skipped))))
+        frappe.msgprint(message)
+
+    def set_nesting_totals(self):
         total_net_sheet_weight = 0
         total_net_sub_assembly_weight = 0
         total_net_scrap_weight = 0
@@ -1559,135 +1818,16 @@ class ProjectMaster(Document):
 
     @frappe.whitelist()
     def remove_add_sfa_raw_material(self):
-        mr_items = self.get("mr_items") or []
-        po_items = self.get("po_items") or []
-        sub_assembly_items = []
-        remaining_mr_items = []
-
-        # Debug: Show initial data
-        print("=== DEBUG: remove_add_sfa_raw_material START ===")
-        print(f"PO Items count: {len(po_items)}")
-        for i, po_item in enumerate(po_items):
-            print(f"PO Item {i+1}: {po_item.item_code}, BOM: {po_item.bom_no}")
-
-        print(f"MR Items count: {len(mr_items)}")
-        for i, mr_item in enumerate(mr_items):
-            print(f"MR Item {i+1}: {mr_item.item_code}, Qty: {mr_item.quantity}")
-
-        # Track processed MR items to avoid duplicates
-        processed_mr_items = set()
-
-        # Process each MR item only ONCE
-        for rmrow in mr_items:
-            print(f"\n--- Processing MR Item: {rmrow.item_code} ---")
-
-            if rmrow.item_code in processed_mr_items:
-                print(f"SKIPPING - Already processed: {rmrow.item_code}")
-                continue
-
-            item_processed = False
-
-            # Check if this MR item matches any BOM in any PO item
-            for po_item in po_items:
-                print(
-                    f"  Checking against PO Item: {po_item.item_code}, BOM: {po_item.bom_no}"
-                )
-
-                bom_doc = get_bom_details(po_item.bom_no)
-                if not bom_doc:
-                    print(f"    No BOM found for {po_item.bom_no}")
-                    continue
-
-                print(f"    BOM found, items in BOM: {len(bom_doc.items)}")
-
-                # Check if this MR item matches any item in the BOM
-                matched_items = [
-                    x
-                    for x in bom_doc.items
-                    if x.item_code == rmrow.item_code
-                    and is_valid_sfa_item(x.custom_msf)
-                ]
-
-                print(f"    Matched items found: {len(matched_items)}")
-
-                if matched_items:
-                    print(f"    CONVERTING to Sub-Assembly: {rmrow.item_code}")
-                    # This MR item should become a sub-assembly item
-                    sub_assembly_items.append(
-                        {
-                            "production_item": rmrow.item_code,
-                            "item_name": rmrow.item_name,
-                            "qty": flt(rmrow.required_bom_qty),
-                            "type_of_manufacturing": "In House",
-                            "parent_item_code": matched_items[0].fg_item,
-                            "schedule_date": nowdate(),
-                        }
-                    )
-                    item_processed = True
-                    processed_mr_items.add(rmrow.item_code)
-                    break  # Stop checking other PO items for this MR item
-                else:
-                    print(f"    No match in this BOM")
-
-            # If MR item wasn't converted to sub-assembly, keep it as MR item
-            if not item_processed and rmrow.item_code not in processed_mr_items:
-                print(f"    KEEPING as MR Item: {rmrow.item_code}")
-                clean_row = rmrow.as_dict()
-                for key in ("name", "idx", "parent", "parentfield", "parenttype"):
-                    clean_row.pop(key, None)
-                remaining_mr_items.append(clean_row)
-                processed_mr_items.add(rmrow.item_code)
-
-        # Debug: Show results before updating tables
-        print(f"\n=== RESULTS ===")
-        print(f"Sub Assembly Items to add: {len(sub_assembly_items)}")
-        for i, item in enumerate(sub_assembly_items):
-            print(
-                f"  Sub-Assembly {i+1}: {item['production_item']}, Qty: {item['qty']}"
-            )
-
-        print(f"Remaining MR Items: {len(remaining_mr_items)}")
-        for i, item in enumerate(remaining_mr_items):
-            print(f"  MR Item {i+1}: {item['item_code']}, Qty: {item['quantity']}")
+        remaining_mr_items, sub_assembly_items = split_sfa_mr_items(
+            self.get("mr_items") or [], self.get("po_items") or []
+        )
 
-        # Clear existing tables
-        print(f"\n=== UPDATING TABLES ===")
-        print(f"Clearing existing tables...")
         self.set("mr_items", [])
         self.set("sub_assembly_items", [])
-
-        # Add remaining MR items
-        print(f"Adding {len(remaining_mr_items)} MR items...")
-        for idx, rm in enumerate(remaining_mr_items, start=1):
+        for rm in remaining_mr_items:
             self.append("mr_items", rm)
-            print(f"  Added MR Item {idx}: {rm['item_code']}")
-
-        # Add sub assembly items
-        print(f"Adding {len(sub_assembly_items)} sub-assembly items...")
-        for idx, item in enumerate(sub_assembly_items, start=1):
+        for item in sub_assembly_items:
             self.append("sub_assembly_items", item)
-            print(f"  Added Sub-Assembly {idx}: {item['production_item']}")
-
-        # Debug: Verify final state
-        print(f"\n=== FINAL VERIFICATION ===")
-        print(f"Final MR Items count: {len(self.mr_items)}")
-        print(f"Final Sub-Assembly Items count: {len(self.sub_assembly_items)}")
-
-        # Check for duplicates in final state
-        mr_item_codes = [item.item_code for item in self.mr_items]
-        sub_item_codes = [item.production_item for item in self.sub_assembly_items]
-
-        print(f"MR Item codes: {mr_item_codes}")
-        print(f"Sub-Assembly Item codes: {sub_item_codes}")
-
-        # Check for overlaps (items that appear in both)
-        overlaps = set(mr_item_codes) & set(sub_item_codes)
-        if overlaps:
-            print(f"❌ DUPLICATES FOUND: {overlaps}")
-        else:
-            print(f"✅ No duplicates found")
-
-        print("=== DEBUG: remove_add_sfa_raw_material END ===\n")
 
         frappe.msgprint(
             f"Updated: {len(remaining_mr_items)} MR items, {len(sub_assembly_items)} sub-assembly items created"
@@ -1697,43 +1837,89 @@ class ProjectMaster(Document):
 #######################
 
 
-def get_bom_details(bom_item_code):
-    bom_creator_name = frappe.db.get_value("BOM", bom_item_code, "bom_creator")
-    if not bom_creator_name:
-        return None
+def split_sfa_mr_items(mr_items, po_items):
+    """Return (MR rows, sub-assembly rows) with SFA items moved to sub-assemblies.
 
-    try:
-        return frappe.get_doc("BOM Creator", bom_creator_name)
-    except frappe.DoesNotExistError:
-        return None
+    An item code repeated across MR rows is kept once, as its first row.
+    """
+    sfa_items, raw_materials = classify_sfa_items(mr_items, po_items)
 
+    processed_mr_items = set()
+    sub_assembly_items = []
+    for rmrow, fg_item in sfa_items:
+        if rmrow.item_code in processed_mr_items:
+            continue
 
-def is_valid_sfa_item(operation_list):
+        processed_mr_items.add(rmrow.item_code)
+        sub_assembly_items.append(
+            {
+                "production_item": rmrow.item_code,
+                "item_name": rmrow.item_name,
+                "qty": flt(rmrow.required_bom_qty),
+                "type_of_manufacturing": "In House",
+                "parent_item_code": fg_item,
+                "schedule_date": nowdate(),
+            }
+        )
+
+    remaining_mr_items = []
+    for rmrow in raw_materials:
+        if rmrow.item_code in processed_mr_items:
+            continue
+
+        processed_mr_items.add(rmrow.item_code)
+        clean_row = rmrow.as_dict() if isinstance(rmrow, Document) else dict(rmrow)
+        for key in ("name", "idx", "parent", "parentfield", "parenttype"):
+            clean_row.pop(key, None)
+        remaining_mr_items.append(clean_row)
+
+    return remaining_mr_items, sub_assembly_items
 
-    if not operation_list:
-        return False
 
-    cache = frappe.cache()
-    valid_ops = cache.get_value("valid_sfa_operations")
+def get_layout_weights(layouts, part_weights, sheet_weight):
+    """Return the parts' weight on one sheet of each of `layouts`.
 
-    if not valid_ops:
-        valid_ops = frappe.get_all(
-            "Operation", filters={"custom_is_valid_for_sfa_item": 1}, pluck="name"
+    Like `add_nesting_items`, throws when the parts of a layout weigh more
+    than the sheet; without a sheet weight there is nothing to check.
+    """
+    layout_weights = [
+        sum(count * part_weights[idx] for idx, count in layout["counts"].items())
+        for layout in layouts
+    ]
+    if sheet_weight and any(
+        round(sheet_weight, 3) < round(total_weight, 3)
+        for total_weight in layout_weights
+    ):
+        frappe.throw(
+            _("Total weight of items cannot be greater than total sheet weight")
         )
-        valid_ops = set(valid_ops)
-        cache.set_value("valid_sfa_operations", list(valid_ops))
 
-    ops = [op.strip() for op in operation_list.split(",") if op.strip()]
-    if not ops:
-        return False
+    return layout_weights
+
 
-    return any(op in valid_ops for op in ops)
+def set_nesting_header_weights(header, total_weight):
+    """Scrap, net weights and percentages of a nesting header from its parts' weight."""
+    header.scrap_weight = round((header.sheet_weight or 0) - (total_weight or 0), 3)
+    header.net_sheet_weight = round(
+        (header.nesting_qty or 0) * (header.sheet_weight or 0), 3
+    )
+    header.net_sub_assembly_weight = round(
+        (header.nesting_qty or 0) * (total_weight or 0), 3
+    )
+    header.net_scrap_weight = round(
+        (header.nesting_qty or 0) * (header.scrap_weight or 0), 3
+    )
+
+    if header.sheet_weight:
+        header.scrap_percentage = round(
+            (header.scrap_weight / header.sheet_weight) * 100, 3
+        )
+        header.utilization_percentage = round(100 - header.scrap_percentage, 3)
 
 
 @frappe.whitelist()
-def download_raw_materials(doc, warehouses=None):
-    if isinstance(doc, str):
-        doc = frappe._dict(json.loads(doc))
+def download_raw_materials(doc=None, warehouses=None, name=None, overrides=None):
+    doc = get_planning_doc(doc, name, overrides)
 
     item_list = [
         [
@@ -1761,6 +1947,12 @@ def download_raw_materials(doc, warehouses=None):
 
     duplicate_item_wh_list = frappe._dict()
 
+    item_bins = {}
+    if not doc.get("for_warehouse"):
+        item_bins = get_item_bins(
+            get_bin_snapshot([d.get("item_code") for d in items], doc.company)
+        )
+
     for d in items:
         key = (d.get("item_code"), d.get("warehouse"))
         if key in duplicate_item_wh_list:
@@ -1788,8 +1980,7 @@ def download_raw_materials(doc, warehouses=None):
         item_list.append(rm_data)
 
         if not doc.get("for_warehouse"):
-            row = {"item_code": d.get("item_code")}
-            for bin_dict in get_bin_details(row, doc.company, all_warehouse=True):
+            for bin_dict in item_bins.get(d.get("item_code"), []):
                 if d.get("warehouse") == bin_dict.get("warehouse"):
                     continue
 
@@ -1811,7 +2002,13 @@ def download_raw_materials(doc, warehouses=None):
 
 
 def get_exploded_items(
-    item_details, company, bom_no, include_non_stock_items, planned_qty=1, doc=None
+    item_details,
+    company,
+    bom_no,
+    include_non_stock_items,
+    planned_qty=1,
+    doc=None,
+    pegging=None,
 ):
     bei = frappe.qb.DocType("BOM Explosion Item")
     bom = frappe.qb.DocType("BOM")
@@ -1859,18 +2056,44 @@ def get_exploded_items(
         .groupby(bei.item_code, bei.stock_uom)
     ).run(as_dict=True)
 
+    uom_conversion_factors = get_uom_conversion_factors(
+        {d.item_code for d in data if not d.conversion_factor and d.purchase_uom}
+    )
     for d in data:
         if not d.conversion_factor and d.purchase_uom:
-            d.conversion_factor = get_uom_conversion_factor(d.item_code, d.purchase_uom)
+            d.conversion_factor = uom_conversion_factors.get(
+                (d.item_code, d.purchase_uom)
+            )
+        if pegging:
+            # BOM Explosion Item is already flat, the path stops at the root
+            pegging.add(d.item_code, (bom_no,), d.qty)
         item_details.setdefault(d.get("item_code"), d)
 
     return item_details
 
 
+def get_default_suppliers(item_codes, company):
+    """Return {item_code: default_supplier} from the Item Defaults of `company`."""
+    if not item_codes:
+        return {}
+
+    return {
+        d.parent: d.default_supplier
+        for d in frappe.get_all(
+            "Item Default",
+            filters={
+                "parent": ("in", list(item_codes)),
+                "parenttype": "Item",
+                "company": company,
+                "default_supplier": ("is", "set"),
+            },
+            fields=["parent", "default_supplier"],
+        )
+    }
+
+
 def get_uom_conversion_factor(item_code, uom):
-    return frappe.db.get_value(
-        "UOM Conversion Detail", {"parent": item_code, "uom": uom}, "conversion_factor"
-    )
+    return get_uom_conversion_factors([item_code]).get((item_code, uom))
 
 
 def get_subitems(
@@ -1883,86 +2106,46 @@ def get_subitems(
     include_subcontracted_items,
     parent_qty,
     planned_qty=1,
+    pegging=None,
 ):
-    bom_item = frappe.qb.DocType("BOM Item")
-    bom = frappe.qb.DocType("BOM")
-    item = frappe.qb.DocType("Item")
-    item_default = frappe.qb.DocType("Item Default")
-    item_uom = frappe.qb.DocType("UOM Conversion Detail")
+    """Add the raw materials of `bom_no` to `item_details`.
 
-    items = (
-        frappe.qb.from_(bom_item)
-        .join(bom)
-        .on(bom.name == bom_item.parent)
-        .join(item)
-        .on(bom_item.item_code == item.name)
-        .left_join(item_default)
-        .on((item.name == item_default.parent) & (item_default.company == company))
-        .left_join(item_uom)
-        .on((item.name == item_uom.parent) & (item_uom.uom == item.purchase_uom))
-        .select(
-            bom_item.item_code,
-            item.default_material_request_type,
-            item.item_name,
-            IfNull(
-                parent_qty
-                * Sum(bom_item.stock_qty / IfNull(bom.quantity, 1))
-                * planned_qty,
-                0,
-            ).as_("qty"),
-            item.is_sub_contracted_item.as_("is_sub_contracted"),
-            bom_item.source_warehouse,
-            item.default_bom.as_("default_bom"),
-            bom_item.description.as_("description"),
-            bom_item.stock_uom.as_("stock_uom"),
-            item.min_order_qty.as_("min_order_qty"),
-            item.safety_stock.as_("safety_stock"),
-            item_default.default_warehouse,
-            item.purchase_uom,
-            item_uom.conversion_factor,
-            bom.item.as_("main_bom_item"),
-        )
-        .where(
-            (bom.name == bom_no)
-            & (bom_item.docstatus < 2)
-            & (
-                item.is_stock_item.isin([0, 1])
-                if include_non_stock_items
-                else item.is_stock_item == 1
+    With `include_exploded_items`, items that have a default BOM are
+    exploded into it (when they are made or bought in house, or subcontracted
+    and `include_subcontracted_items` is set) instead of being listed; the
+    tree is read one depth at a time by `explode_raw_materials`. Flattened
+    BOM Item cannot serve this walk: it follows each BOM Item's own `bom_no`,
+    while here sub-BOMs are the items' default BOMs, chosen per row.
+    """
+    include_exploded_items = data.get("include_exploded_items")
+
+    def get_sub_bom(row, qty):
+        if not include_exploded_items or not row.default_bom:
+            return None
+
+        if (
+            (
+                row.default_material_request_type in ["Manufacture", "Purchase"]
+                and not row.is_sub_contracted
             )
-        )
-        .groupby(bom_item.item_code)
-    ).run(as_dict=True)
+            or (row.is_sub_contracted and include_subcontracted_items)
+        ) and qty > 0:
+            return row.default_bom
 
-    for d in items:
-        if not data.get("include_exploded_items") or not d.default_bom:
-            if d.item_code in item_details:
-                item_details[d.item_code].qty = item_details[d.item_code].qty + d.qty
-            else:
-                if not d.conversion_factor and d.purchase_uom:
-                    d.conversion_factor = get_uom_conversion_factor(
-                        d.item_code, d.purchase_uom
-                    )
+        return False
 
-                item_details[d.item_code] = d
+    raw_materials = explode_raw_materials(
+        {bom_no: flt(parent_qty) * flt(planned_qty)},
+        company,
+        include_non_stock_items,
+        get_sub_bom,
+        with_paths=pegging is not None,
+    )
+    if pegging:
+        for row in raw_materials:
+            pegging.add(row.item_code, row.bom_path, row.qty)
 
-        if data.get("include_exploded_items") and d.default_bom:
-            if (
-                d.default_material_request_type in ["Manufacture", "Purchase"]
-                and not d.is_sub_contracted
-            ) or (d.is_sub_contracted and include_subcontracted_items):
-                if d.qty > 0:
-                    get_subitems(
-                        doc,
-                        data,
-                        item_details,
-                        d.default_bom,
-                        company,
-                        include_non_stock_items,
-                        include_subcontracted_items,
-                        d.qty,
-                    )
-    return item_details
+    return add_to_item_details(item_details, raw_materials)
 
 
 def get_material_request_items(
@@ -1974,6 +2157,7 @@ def get_material_request_items(
     include_safety_stock,
     warehouse,
     bin_dict,
+    context,
 ):
     total_qty = row["qty"]
 
@@ -1990,7 +2174,7 @@ def get_material_request_items(
     ):
         required_qty = row["min_order_qty"]
 
-    item_group_defaults = get_item_group_defaults(row.item_code, company)
+    item_group_defaults = context.get_item_group_defaults(row.item_code)
 
     if not row["purchase_uom"]:
         row["purchase_uom"] = row["stock_uom"]
@@ -2005,15 +2189,13 @@ def get_material_request_items(
 
             required_qty = required_qty / row["conversion_factor"]
 
-    if frappe.db.get_value("UOM", row["purchase_uom"], "must_be_whole_number"):
+    if context.is_whole_number_uom(row["purchase_uom"]):
         required_qty = ceil(required_qty)
 
     if include_safety_stock:
         required_qty += flt(row["safety_stock"])
 
-    item_details = frappe.get_cached_value(
-        "Item", row.item_code, ["purchase_uom", "stock_uom"], as_dict=1
-    )
+    item_details = context.get_item(row.item_code)
 
     conversion_factor = 1.0
     if (
@@ -2021,11 +2203,8 @@ def get_material_request_items(
         and item_details.purchase_uom
         and item_details.purchase_uom != item_details.stock_uom
     ):
-        conversion_factor = (
-            get_conversion_factor(row.item_code, item_details.purchase_uom).get(
-                "conversion_factor"
-            )
-            or 1.0
+        conversion_factor = context.get_conversion_factor(
+            row.item_code, item_details.purchase_uom
         )
 
     if required_qty > 0:
@@ -2130,40 +2309,14 @@ def get_bin_details(row, company, for_warehouse=None, all_warehouse=False):
     if isinstance(row, str):
         row = frappe._dict(json.loads(row))
 
-    bin = frappe.qb.DocType("Bin")
-    wh = frappe.qb.DocType("Warehouse")
-
-    subquery = frappe.qb.from_(wh).select(wh.name).where(wh.company == company)
-
-    warehouse = ""
+    warehouse = None
     if not all_warehouse:
         warehouse = (
             for_warehouse or row.get("source_warehouse") or row.get("default_warehouse")
         )
 
-    if warehouse:
-        lft, rgt = frappe.db.get_value("Warehouse", warehouse, ["lft", "rgt"])
-        subquery = subquery.where(
-            (wh.lft >= lft) & (wh.rgt <= rgt) & (wh.name == bin.warehouse)
-        )
-
-    query = (
-        frappe.qb.from_(bin)
-        .select(
-            bin.warehouse,
-            IfNull(Sum(bin.projected_qty), 0).as_("projected_qty"),
-            IfNull(Sum(bin.actual_qty), 0).as_("actual_qty"),
-            IfNull(Sum(bin.ordered_qty), 0).as_("ordered_qty"),
-            IfNull(Sum(bin.reserved_qty_for_production), 0).as_(
-                "reserved_qty_for_production"
-            ),
-            IfNull(Sum(bin.planned_qty), 0).as_("planned_qty"),
-        )
-        .where((bin.item_code == row["item_code"]) & (bin.warehouse.isin(subquery)))
-        .groupby(bin.item_code, bin.warehouse)
-    )
-
-    return query.run(as_dict=True)
+    bin_snapshot = get_bin_snapshot([row["item_code"]], company, warehouse)
+    return get_item_bins(bin_snapshot).get(row["item_code"], [])
 
 
 @frappe.whitelist()
@@ -2176,14 +2329,18 @@ def get_so_details(sales_order):
     )
 
 
-def get_warehouse_list(warehouses):
+def get_warehouse_list(warehouses, company=None):
     warehouse_list = []
 
     if isinstance(warehouses, str):
         warehouses = json.loads(warehouses)
 
     for row in warehouses:
-        child_warehouses = frappe.db.get_descendants("Warehouse", row.get("warehouse"))
+        child_warehouses = (
+            get_subtree_warehouses(row.get("warehouse"), company, include_self=False)
+            if company
+            else frappe.db.get_descendants("Warehouse", row.get("warehouse"))
+        )
         if child_warehouses:
             warehouse_list.extend(child_warehouses)
         else:
@@ -2192,15 +2349,103 @@ def get_warehouse_list(warehouses):
     return warehouse_list
 
 
+PLANNING_DOC_FIELDS = [
+    "name",
+    "company",
+    "for_warehouse",
+    "ignore_existing_ordered_qty",
+    "include_safety_stock",
+    "include_non_stock_items",
+    "include_subcontracted_items",
+    "skip_available_sub_assembly_item",
+    "consider_minimum_order_qty",
+    "record_material_pegging",
+]
+
+PLANNING_TABLE_FIELDS = {
+    "po_items": (
+        "Project Master Item",
+        ["name", "idx", "item_code", "bom_no", "planned_qty", "include_exploded_items"],
+    ),
+    "sub_assembly_items": (
+        "Project Master Sub Assembly Item",
+        ["name", "idx", "production_item", "bom_no", "qty", "type_of_manufacturing"],
+    ),
+}
+
+
+def get_planning_doc(doc=None, name=None, overrides=None):
+    """Return the planning input of a Project Master as a `frappe._dict`.
+
+    Callers may still post the whole form as `doc`. Otherwise the header
+    and child rows are read from the database, projected to the columns
+    planning uses, and `overrides` are applied on top: unsaved header
+    values, or whole child tables the form has changed but not saved yet.
+    """
+    if doc:
+        return frappe._dict(json.loads(doc)) if isinstance(doc, str) else doc
+
+    if isinstance(overrides, str):
+        overrides = json.loads(overrides)
+
+    frappe.has_permission("Project Master", "read", name, throw=True)
+
+    planning_doc = frappe.db.get_value(
+        "Project Master", name, PLANNING_DOC_FIELDS, as_dict=True
+    )
+    for table, (doctype, fields) in PLANNING_TABLE_FIELDS.items():
+        planning_doc[table] = frappe.get_all(
+            doctype,
+            filters={
+                "parent": name,
+                "parenttype": "Project Master",
+                "parentfield": table,
+            },
+            fields=fields,
+            order_by="idx",
+        )
+
+    for key, value in (overrides or {}).items():
+        if key in PLANNING_TABLE_FIELDS:
+            planning_doc[key] = [frappe._dict(row) for row in value]
+        elif key in PLANNING_DOC_FIELDS and key != "name":
+            planning_doc[key] = value
+
+    return planning_doc
+
+
 @frappe.whitelist()
 def get_items_for_material_requests(
-    doc, warehouses=None, get_parent_warehouse_data=None
+    doc=None, warehouses=None, get_parent_warehouse_data=None, name=None, overrides=None
+):
+    return make_items_for_material_requests(
+        get_planning_doc(doc, name, overrides), warehouses, get_parent_warehouse_data
+    )
+
+
+def make_items_for_material_requests(
+    doc, warehouses=None, get_parent_warehouse_data=None, progress=None
 ):
+    """Plan the raw material (MR) rows of `doc`.
+
+    `progress(stage, percent)` is called as the run moves through its
+    stages, for the background mode. With `record_material_pegging` set,
+    each row carries in `pegging` the assembly item rows and BOM paths its
+    requirement comes from.
+    """
+    if progress is None:
+
+        def progress(stage, percent):
+            pass
+
     if isinstance(doc, str):
         doc = frappe._dict(json.loads(doc))
 
     if warehouses:
-        warehouses = list(set(get_warehouse_list(warehouses)))
+        # keep the selected order, it is the priority stock is drawn in
+        warehouses = list(
+            dict.fromkeys(get_warehouse_list(warehouses, doc.get("company")))
+        )
 
         if (
             doc.get("for_warehouse")
@@ -2210,6 +2455,7 @@ def get_items_for_material_requests(
             warehouses.remove(doc.get("for_warehouse"))
 
     doc["mr_items"] = []
+    pegging = PeggingCollector() if doc.get("record_material_pegging") else None
 
     po_items = doc.get("po_items") if doc.get("po_items") else doc.get("items")
 
@@ -2244,6 +2490,16 @@ def get_items_for_material_requests(
 
     so_item_details = frappe._dict()
 
+    context = PlanningContext(company).load_items(
+        {
+            row.get("item_code")
+            for row in po_items
+            if not (row.get("bom") or row.get("bom_no"))
+        }
+    )
+
+    # planned sub-assemblies already exploded by an earlier po_item
+    exploded_sub_assemblies = set()
     sub_assembly_items = defaultdict(int)
     if doc.get("skip_available_sub_assembly_item") and doc.get("sub_assembly_items"):
         for d in doc.get("sub_assembly_items"):
@@ -2251,7 +2507,11 @@ def get_items_for_material_requests(
                 "qty"
             )
 
-    for data in po_items:
+    for idx, data in enumerate(po_items):
+        progress(_("Exploding BOMs"), 60 * idx / len(po_items))
+        if pegging:
+            pegging.set_po_item(data.get("name"), data.get("item_code"))
+
         if not data.get("include_exploded_items") and doc.get("sub_assembly_items"):
             data["include_exploded_items"] = 1
 
@@ -2297,6 +2557,8 @@ def get_items_for_material_requests(
                             include_non_stock_items,
                             sub_assembly_items,
                             planned_qty=planned_qty,
+                            pegging=pegging,
+                            exploded=exploded_sub_assemblies,
                         )
 
                 elif data.get("include_exploded_items") and include_subcontracted_items:
@@ -2308,6 +2570,7 @@ def get_items_for_material_requests(
                         include_non_stock_items,
                         planned_qty=planned_qty,
                         doc=doc,
+                        pegging=pegging,
                     )
                 else:
                     item_details = get_subitems(
@@ -2320,12 +2583,19 @@ def get_items_for_material_requests(
                         include_subcontracted_items,
                         1,
                         planned_qty=planned_qty,
+                        pegging=pegging,
                     )
         elif data.get("item_code"):
-            item_master = frappe.get_doc("Item", data["item_code"]).as_dict()
+            item_master = context.get_item(data["item_code"])
+            if not item_master:
+                frappe.throw(
+                    _("Item {0} does not exist").format(data["item_code"]),
+                    frappe.DoesNotExistError,
+                )
+
             purchase_uom = item_master.purchase_uom or item_master.stock_uom
             conversion_factor = (
-                get_uom_conversion_factor(item_master.name, purchase_uom)
+                context.get_uom_conversion_factor(item_master.name, purchase_uom)
                 if item_master.purchase_uom
                 else 1.0
             )
@@ -2335,11 +2605,13 @@ def get_items_for_material_requests(
                     "item_name": item_master.item_name,
                     "default_bom": doc.bom,
                     "purchase_uom": purchase_uom,
-                    "default_warehouse": item_master.default_warehouse,
+                    "default_warehouse": context.get_item_default(
+                        item_master.name
+                    ).default_warehouse,
                     "min_order_qty": item_master.min_order_qty,
                     "default_material_request_type": item_master.default_material_request_type,
                     "qty": planned_qty or 1,
-                    "is_sub_contracted": item_master.is_subcontracted_item,
+                    "is_sub_contracted": item_master.is_sub_contracted_item,
                     "item_code": item_master.name,
                     "description": item_master.description,
                     "stock_uom": item_master.stock_uom,
@@ -2347,6 +2619,8 @@ def get_items_for_material_requests(
                     "safety_stock": item_master.safety_stock,
                 }
             )
+            if pegging:
+                pegging.add(item_master.name, (), planned_qty or 1)
 
         sales_order = doc.get("sales_order")
 
@@ -2359,11 +2633,42 @@ def get_items_for_material_requests(
             else:
                 so_item_details[sales_order][item_code] = details
 
+    progress(_("Reading stock"), 60)
+
+    # one bin snapshot per warehouse scope (usually just the for_warehouse)
+    # instead of a Bin query per item
+    def get_bin_scope(details):
+        return (
+            warehouse
+            or details.get("source_warehouse")
+            or details.get("default_warehouse")
+        )
+
+    scope_wise_items = defaultdict(set)
+    for item_dict in so_item_details.values():
+        for details in item_dict.values():
+            scope_wise_items[get_bin_scope(details)].add(details.item_code)
+
+    context.load_items(
+        {
+            item_code
+            for item_codes in scope_wise_items.values()
+            for item_code in item_codes
+        }
+    )
+
+    scope_wise_bins = {
+        scope: get_item_bins(get_bin_snapshot(item_codes, doc.company, scope))
+        for scope, item_codes in scope_wise_items.items()
+    }
+
+    progress(_("Building material request items"), 70)
+
     mr_items = []
     for sales_order in so_item_details:
         item_dict = so_item_details[sales_order]
         for details in item_dict.values():
-            bin_dict = get_bin_details(details, doc.company, warehouse)
+            bin_dict = scope_wise_bins[get_bin_scope(details)].get(details.item_code)
             bin_dict = bin_dict[0] if bin_dict else {}
 
             if details.qty > 0:
@@ -2376,16 +2681,24 @@ def get_items_for_material_requests(
                     include_safety_stock,
                     warehouse,
                     bin_dict,
+                    context,
                 )
                 if items:
                     mr_items.append(items)
 
     if (not ignore_existing_ordered_qty or get_parent_warehouse_data) and warehouses:
-        new_mr_items = []
-        for item in mr_items:
-            get_materials_from_other_locations(item, warehouses, new_mr_items, company)
+        progress(_("Checking other warehouses"), 85)
+        context.load_items({item["item_code"] for item in mr_items})
+        mr_items = allocate_stock(
+            mr_items,
+            warehouses,
+            lambda item: context.is_whole_number_uom(
+                context.get_item(item["item_code"]).purchase_uom
+            ),
+        )
 
-        mr_items = new_mr_items
+    if pegging:
+        set_mr_item_pegging(mr_items, pegging)
 
     if not mr_items:
         to_enable = frappe.bold(_("Ignore Existing Projected Quantity"))
@@ -2405,62 +2718,234 @@ def get_items_for_material_requests(
     return mr_items
 
 
-def get_materials_from_other_locations(item, warehouses, new_mr_items, company):
-    from erpnext.stock.doctype.pick_list.pick_list import get_available_item_locations
+MR_ITEM_KEY_FIELDS = ["item_code", "warehouse", "material_request_type", "sales_order"]
+MR_ITEM_PLAN_FIELDS = [
+    "from_warehouse",
+    "item_name",
+    "quantity",
+    "required_bom_qty",
+    "uom",
+    "conversion_factor",
+    "description",
+    "min_order_qty",
+    "actual_qty",
+    "projected_qty",
+    "reserved_qty_for_production",
+    "safety_stock",
+    "pegging",
+]
+
 
-    stock_uom, purchase_uom = frappe.db.get_value(
-        "Item", item.get("item_code"), ["stock_uom", "purchase_uom"]
+@frappe.whitelist()
+def get_mr_item_changes(doc=None, warehouses=None, name=None, overrides=None):
+    """Plan the MR items again and return only what differs from the saved rows.
+
+    The saved rows have had their SFA items moved to sub-assemblies and
+    their item codes deduplicated, so the new plan goes through the same
+    `split_sfa_mr_items` before it is compared. Returns `{"insert": [rows],
+    "update": [{name, changed fields}], "delete": [row names],
+    "sub_assembly_items": [rows]}`; see `diff_mr_items`.
+    """
+    doc = get_planning_doc(doc, name, overrides)
+    existing = frappe.get_all(
+        "Project Master Raw Material",
+        filters={
+            "parent": doc.name,
+            "parenttype": "Project Master",
+            "parentfield": "mr_items",
+        },
+        fields=["name", *MR_ITEM_KEY_FIELDS, *MR_ITEM_PLAN_FIELDS],
+        order_by="idx",
     )
 
-    locations = get_available_item_locations(
-        item.get("item_code"),
-        warehouses,
-        item.get("quantity") * item.get("conversion_factor"),
-        company,
-        ignore_validation=True,
+    mr_items, sub_assembly_items = split_sfa_mr_items(
+        [
+            frappe._dict(row)
+            for row in make_items_for_material_requests(doc, warehouses)
+        ],
+        doc.get("po_items") or [],
     )
 
-    required_qty = item.get("quantity")
-    if item.get("conversion_factor") and item.get("purchase_uom") != item.get(
-        "stock_uom"
-    ):
-        # Convert qty to stock UOM
-        required_qty = required_qty * item.get("conversion_factor")
+    changes = diff_mr_items(existing, mr_items)
+    changes["sub_assembly_items"] = sub_assembly_items
+    return changes
 
-    # get available material by transferring to production warehouse
-    for d in locations:
-        if required_qty <= 0:
-            return
 
-        new_dict = copy.deepcopy(item)
-        quantity = required_qty if d.get("qty") > required_qty else d.get("qty")
+def diff_mr_items(existing, new_items):
+    """Match `new_items` to `existing` rows on MR_ITEM_KEY_FIELDS.
 
-        new_dict.update(
-            {
-                "quantity": quantity,
-                "material_request_type": "Material Transfer",
-                # internal transfer should be in stock UOM
-                "uom": new_dict.get("stock_uom"),
-                "from_warehouse": d.get("warehouse"),
-                "conversion_factor": 1.0,
-            }
+    Rows sharing a key are paired in order. A matched row is only updated
+    when one of MR_ITEM_PLAN_FIELDS changed, so unchanged rows (and the
+    requested/ordered qty they track) are left alone.
+    """
+    existing_by_key = defaultdict(list)
+    for row in existing:
+        existing_by_key[tuple(row.get(f) or None for f in MR_ITEM_KEY_FIELDS)].append(
+            row
         )
 
-        required_qty -= quantity
-        new_mr_items.append(new_dict)
+    changes = {"insert": [], "update": [], "delete": []}
+    for item in new_items:
+        key = tuple(item.get(f) or None for f in MR_ITEM_KEY_FIELDS)
+        if not existing_by_key.get(key):
+            changes["insert"].append(item)
+            continue
+
+        row = existing_by_key[key].pop(0)
+        changed = {
+            field: item.get(field)
+            for field in MR_ITEM_PLAN_FIELDS
+            if not is_same_value(row.get(field), item.get(field))
+        }
+        if changed:
+            changes["update"].append({"name": row.name, **changed})
+
+    changes["delete"] = [row.name for rows in existing_by_key.values() for row in rows]
+    return changes
+
+
+def is_same_value(old, new):
+    if isinstance(old, int | float) or isinstance(new, int | float):
+        return flt(old, 6) == flt(new, 6)
+
+    return (old or None) == (new or None)
+
+
+MR_ITEMS_RESULT_CACHE = "abstra_mr_items_result"
+MR_ITEMS_RESULT_EXPIRY = 30 * 60
+
+
+def get_mr_items_input_hash(doc, warehouses=None, versions=None):
+    """Hash of everything a MR items run depends on.
+
+    `versions` are the `modified` stamps of the documents the run reads, as
+    returned by `get_mr_items_dependency_versions`.
+    """
+    inputs = {
+        key: value
+        for key, value in doc.items()
+        if key not in ("mr_items", "modified", "modified_by")
+        and not key.startswith("__")
+    }
+    payload = json.dumps(
+        [inputs, warehouses or [], versions or {}],
+        sort_keys=True,
+        default=str,
+        separators=(",", ":"),
+    )
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def get_mr_items_dependency_versions(doc):
+    """Return the `modified` of the BOMs, Items and Bins a MR items run reads.
+
+    BOMs and Items are stamped per document over the whole BOM trees of the
+    planned rows; Bins by their latest change per item.
+    """
+    rows = (doc.get("po_items") or doc.get("items") or []) + (
+        doc.get("sub_assembly_items") or []
+    )
+    bom_children = explode_bom_trees([row.get("bom_no") for row in rows])
+    item_codes = {
+        row.get("item_code") or row.get("production_item") for row in rows
+    } | {d.item_code for children in bom_children.values() for d in children}
+    item_codes.discard(None)
+
+    versions = get_dependency_versions([{"BOM": set(bom_children), "Item": item_codes}])
+    versions["Bin"] = get_bin_versions(item_codes)
+    return versions
+
+
+def get_bin_versions(item_codes):
+    """Return {item_code: latest Bin modified} for `item_codes`."""
+    if not item_codes:
+        return {}
+
+    bin = frappe.qb.DocType("Bin")
+    rows = (
+        frappe.qb.from_(bin)
+        .select(bin.item_code, Max(bin.modified).as_("modified"))
+        .where(bin.item_code.isin(list(item_codes)))
+        .groupby(bin.item_code)
+    ).run(as_dict=True)
+    return {row.item_code: str(row.modified) for row in rows}
+
+
+def get_mr_items_result_key(name, input_hash):
+    return f"{MR_ITEMS_RESULT_CACHE}:{name}:{input_hash}"
+
+
+@frappe.whitelist()
+def enqueue_items_for_material_requests(
+    doc=None, warehouses=None, name=None, overrides=None
+):
+    """Background mode of `get_items_for_material_requests`.
+
+    A result stored for the same document and inputs is returned straight
+    away; otherwise the run is queued and its progress and completion are
+    published to the user as `abstra_mr_items_progress` /
+    `abstra_mr_items_done` events, after which the form pulls the result
+    with `get_items_for_material_requests_result`. The inputs include the
+    `modified` of every BOM, Item and Bin the run reads, so changing any of
+    them misses the stored result; results expire after 30 minutes.
+    """
+    doc = get_planning_doc(doc, name, overrides)
+    if isinstance(warehouses, str):
+        warehouses = json.loads(warehouses)
+
+    frappe.has_permission("Project Master", "write", throw=True)
+
+    input_hash = get_mr_items_input_hash(
+        doc, warehouses, get_mr_items_dependency_versions(doc)
+    )
+    items = frappe.cache().get_value(get_mr_items_result_key(doc.name, input_hash))
+    if items is not None:
+        return {"status": "Completed", "input_hash": input_hash, "items": items}
+
+    frappe.enqueue(
+        "abstra.abstra.doctype.project_master.project_master.build_items_for_material_requests",
+        queue="long",
+        timeout=3600,
+        job_id=f"mr_items::{doc.name}::{input_hash}",
+        deduplicate=True,
+        enqueue_after_commit=True,
+        doc=doc,
+        warehouses=warehouses,
+        input_hash=input_hash,
+        user=frappe.session.user,
+    )
+    return {"status": "Queued", "input_hash": input_hash}
+
+
+def build_items_for_material_requests(doc, warehouses, input_hash, user):
+    def publish(event, message):
+        message.update({"name": doc.name, "input_hash": input_hash})
+        frappe.publish_realtime(event, message, user=user)
 
-    # raise purchase request for remaining qty
+    def progress(stage, percent):
+        publish("abstra_mr_items_progress", {"stage": stage, "progress": percent})
 
-    precision = frappe.get_precision("Material Request Plan Item", "quantity")
-    if flt(required_qty, precision) > 0:
-        required_qty = required_qty
+    try:
+        items = make_items_for_material_requests(doc, warehouses, progress=progress)
+    except Exception:
+        frappe.log_error(
+            title=_("Material request items for {0} failed").format(doc.name)
+        )
+        publish("abstra_mr_items_done", {"status": "Failed"})
+        return
 
-        if frappe.db.get_value("UOM", purchase_uom, "must_be_whole_number"):
-            required_qty = ceil(required_qty)
+    frappe.cache().set_value(
+        get_mr_items_result_key(doc.name, input_hash),
+        items,
+        expires_in_sec=MR_ITEMS_RESULT_EXPIRY,
+    )
+    publish("abstra_mr_items_done", {"status": "Completed"})
 
-        item["quantity"] = required_qty / item.get("conversion_factor")
 
-        new_mr_items.append(item)
+@frappe.whitelist()
+def get_items_for_material_requests_result(name, input_hash):
+    frappe.has_permission("Project Master", "read", throw=True)
+    return frappe.cache().get_value(get_mr_items_result_key(name, input_hash))
 
 
 @frappe.whitelist()
@@ -2475,82 +2960,121 @@ def get_item_data(item_code):
 
 
 def get_sub_assembly_items(
-    sub_assembly_items,
     bin_details,
     bom_no,
     bom_data,
     to_produce_qty,
-    company,
-    warehouse=None,
+    bom_children,
     indent=0,
     skip_available_sub_assembly_item=False,
+    subtree_memo=None,
 ):
-    data = get_bom_children(parent=bom_no)
-    for d in data:
+    """Explode `bom_no` from the preloaded `bom_children` map into `bom_data`.
+
+    `bin_details` is the shared {item_code: [bins]} ledger from
+    `get_projected_bins`; when netting, available projected qty is drawn down
+    in it so stock is consumed once across all po_items.
+    """
+    if subtree_memo is not None and not skip_available_sub_assembly_item:
+        # without netting the explosion is linear in qty, reuse the unit subtree
+        for d, unit_qty, depth in get_unit_subtree(bom_no, bom_children, subtree_memo):
+            stock_qty = unit_qty * flt(to_produce_qty)
+            if stock_qty > 0:
+                bom_data.append(
+                    get_sub_assembly_row(d, bin_details, stock_qty, indent + depth)
+                )
+
+        return
+
+    for d in bom_children.get(bom_no, []):
         if d.expandable:
-            parent_item_code = frappe.get_cached_value("BOM", bom_no, "item")
             stock_qty = (d.stock_qty / d.parent_bom_qty) * flt(to_produce_qty)
 
-            if (
-                skip_available_sub_assembly_item
-                and d.item_code not in sub_assembly_items
-            ):
-                bin_details.setdefault(
-                    d.item_code, get_bin_details(d, company, for_warehouse=warehouse)
-                )
-
-                for _bin_dict in bin_details[d.item_code]:
-                    if _bin_dict.projected_qty > 0:
-                        if _bin_dict.projected_qty >= stock_qty:
-                            _bin_dict.projected_qty -= stock_qty
-                            stock_qty = 0
-                            continue
-                        else:
-                            stock_qty = stock_qty - _bin_dict.projected_qty
-                            sub_assembly_items.append(d.item_code)
-            elif warehouse:
-                bin_details.setdefault(
-                    d.item_code, get_bin_details(d, company, for_warehouse=warehouse)
+            if skip_available_sub_assembly_item:
+                stock_qty = net_projected_qty(
+                    bin_details.get(d.item_code, []), stock_qty
                 )
 
             if stock_qty > 0:
-                bom_data.append(
-                    frappe._dict(
-                        {
-                            "actual_qty": (
-                                bin_details[d.item_code][0].get("actual_qty", 0)
-                                if bin_details.get(d.item_code)
-                                else 0
-                            ),
-                            "parent_item_code": parent_item_code,
-                            "description": d.description,
-                            "production_item": d.item_code,
-                            "item_name": d.item_name,
-                            "stock_uom": d.stock_uom,
-                            "uom": d.stock_uom,
-                            "bom_no": d.value,
-                            "is_sub_contracted_item": d.is_sub_contracted_item,
-                            "bom_level": indent,
-                            "indent": indent,
-                            "stock_qty": stock_qty,
-                        }
-                    )
-                )
+                bom_data.append(get_sub_assembly_row(d, bin_details, stock_qty, indent))
 
                 if d.value:
                     get_sub_assembly_items(
-                        sub_assembly_items,
                         bin_details,
                         d.value,
                         bom_data,
                         stock_qty,
-                        company,
-                        warehouse,
+                        bom_children,
                         indent=indent + 1,
                         skip_available_sub_assembly_item=skip_available_sub_assembly_item,
+                        subtree_memo=subtree_memo,
                     )
 
 
+def get_sub_assembly_snapshot(name):
+    return frappe.cache().get_value(f"abstra_sub_assembly_rows:{name}") or {}
+
+
+def set_sub_assembly_snapshot(name, snapshot):
+    frappe.cache().set_value(
+        f"abstra_sub_assembly_rows:{name}", snapshot, expires_in_sec=24 * 60 * 60
+    )
+
+
+def get_dependency_versions(dependencies):
+    """Return {doctype: {name: modified}} for the documents named in `dependencies`.
+
+    `dependencies` is an iterable of {doctype: names}; each doctype is read
+    with one query.
+    """
+    names = defaultdict(set)
+    for deps in dependencies:
+        for doctype, doc_names in deps.items():
+            names[doctype].update(doc_names)
+
+    return {
+        doctype: {
+            d.name: str(d.modified)
+            for d in frappe.get_all(
+                doctype,
+                filters={"name": ("in", list(doc_names))},
+                fields=["name", "modified"],
+            )
+        }
+        for doctype, doc_names in names.items()
+        if doc_names
+    }
+
+
+def is_dependency_current(dependencies, versions):
+    return all(
+        modified is not None and versions.get(doctype, {}).get(name) == modified
+        for doctype, doc_versions in dependencies.items()
+        for name, modified in doc_versions.items()
+    )
+
+
+def get_sub_assembly_row(d, bin_details, stock_qty, indent):
+    return SubAssemblyRow(
+        actual_qty=(
+            bin_details[d.item_code][0].get("actual_qty", 0)
+            if bin_details.get(d.item_code)
+            else 0
+        ),
+        parent_item_code=d.parent_item_code,
+        description=d.description,
+        production_item=d.item_code,
+        item_name=d.item_name,
+        stock_uom=d.stock_uom,
+        uom=d.stock_uom,
+        bom_no=d.value,
+        is_sub_contracted_item=d.is_sub_contracted_item,
+        bom_level=indent,
+        indent=indent,
+        stock_qty=stock_qty,
+    )
+
+
 def set_default_warehouses(row, default_warehouses):
     for field in ["wip_warehouse", "fg_warehouse"]:
         if not row.get(field):
@@ -2632,84 +3156,51 @@ def get_raw_materials_of_sub_assembly_items(
     include_non_stock_items,
     sub_assembly_items,
     planned_qty=1,
+    pegging=None,
+    exploded=None,
 ):
-    bei = frappe.qb.DocType("BOM Item")
-    bom = frappe.qb.DocType("BOM")
-    item = frappe.qb.DocType("Item")
-    item_default = frappe.qb.DocType("Item Default")
-    item_uom = frappe.qb.DocType("UOM Conversion Detail")
-
-    items = (
-        frappe.qb.from_(bei)
-        .join(bom)
-        .on(bom.name == bei.parent)
-        .join(item)
-        .on(item.name == bei.item_code)
-        .left_join(item_default)
-        .on((item_default.parent == item.name) & (item_default.company == company))
-        .left_join(item_uom)
-        .on((item.name == item_uom.parent) & (item_uom.uom == item.purchase_uom))
-        .select(
-            (IfNull(Sum(bei.stock_qty / IfNull(bom.quantity, 1)), 0) * planned_qty).as_(
-                "qty"
-            ),
-            item.item_name,
-            item.name.as_("item_code"),
-            bei.description,
-            bei.stock_uom,
-            bei.bom_no,
-            item.min_order_qty,
-            bei.source_warehouse,
-            item.default_material_request_type,
-            item.min_order_qty,
-            item_default.default_warehouse,
-            item.purchase_uom,
-            item_uom.conversion_factor,
-            item.safety_stock,
-            bom.item.as_("main_bom_item"),
-        )
-        .where(
-            (bei.docstatus == 1)
-            & (bom.name == bom_no)
-            & (
-                item.is_stock_item.isin([0, 1])
-                if include_non_stock_items
-                else item.is_stock_item == 1
-            )
-        )
-        .groupby(bei.item_code, bei.stock_uom)
-    ).run(as_dict=True)
-
-    for item in items:
-        key = (item.item_code, item.bom_no)
-        if (item.bom_no and key not in sub_assembly_items) or (
-            item.item_code in existing_sub_assembly_items
-        ):
-            continue
-
-        if item.bom_no:
-            planned_qty = flt(sub_assembly_items[key])
-            get_raw_materials_of_sub_assembly_items(
-                existing_sub_assembly_items,
-                item_details,
-                company,
-                item.bom_no,
-                include_non_stock_items,
-                sub_assembly_items,
-                planned_qty=planned_qty,
-            )
-        else:
-            if not item.conversion_factor and item.purchase_uom:
-                item.conversion_factor = get_uom_conversion_factor(
-                    item.item_code, item.purchase_uom
-                )
+    """Collect raw materials below `bom_no`, exploding planned sub-assemblies.
+
+    BOMs are read one depth at a time, all BOMs of a depth together. A
+    planned sub-assembly (item, BOM) is exploded with its qty from
+    `sub_assembly_items`, which already covers all of its parents, so it
+    must be exploded only once per planning run: pass the same `exploded`
+    set for every po_item. The BOM path given to `pegging` is the one the
+    sub-assembly was first reached by.
+    """
+    # bom_no -> (qty to explode, bom path)
+    pending = {bom_no: (flt(planned_qty), (bom_no,))}
+    if exploded is None:
+        exploded = set()
+    raw_materials = []
+
+    while pending:
+        bom_qtys = {name: qty for name, (qty, _path) in pending.items()}
+        bom_paths = {name: path for name, (_qty, path) in pending.items()}
+        pending = {}
+
+        bom_rows = get_raw_material_rows(bom_qtys, company, include_non_stock_items)
+        for parent, rows in bom_rows.items():
+            for item in rows:
+                key = (item.item_code, item.bom_no)
+                if (item.bom_no and key not in sub_assembly_items) or (
+                    item.item_code in existing_sub_assembly_items
+                ):
+                    continue
 
-            if details := item_details.get(item.get("item_code")):
-                details.qty += item.get("qty")
-            else:
-                item_details.setdefault(item.get("item_code"), item)
+                if not item.bom_no:
+                    qty = flt(item.qty) * bom_qtys[parent]
+                    raw_materials.append(frappe._dict(item, qty=qty))
+                    if pegging:
+                        pegging.add(item.item_code, bom_paths[parent], qty)
+                elif key not in exploded:
+                    exploded.add(key)
+                    pending[item.bom_no] = (
+                        flt(sub_assembly_items[key]),
+                        (*bom_paths[parent], item.bom_no),
+                    )
 
-    return item_details
+    return add_to_item_details(item_details, raw_materials)
 
 
 @frappe.whitelist()
@@ -0,0 +1,79 @@
+# Copyright (c) 2026, Abdul Mannan and Contributors
+# See license.txt
+
+import json
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from abstra.planning.pegging import (
+    PeggingCollector,
+    save_material_pegging,
+    set_mr_item_pegging,
+)
+
+
+class TestMaterialPegging(FrappeTestCase):
+    def test_pegs_are_summed_per_po_item_and_path(self):
+        pegging = PeggingCollector()
+        pegging.set_po_item("po-row-1", "FG")
+        pegging.add("RM-A", ["BOM-FG", "BOM-SUB"], 2)
+        pegging.add("RM-A", ("BOM-FG", "BOM-SUB"), 3)
+        pegging.add("RM-B", ("BOM-FG",), 0)
+
+        self.assertEqual(
+            dict(pegging.pegs),
+            {("RM-A", "po-row-1", "FG", ("BOM-FG", "BOM-SUB")): 5},
+        )
+
+    def test_pegs_are_shared_over_the_rows_of_an_item(self):
+        pegging = PeggingCollector()
+        pegging.set_po_item("po-row-1", "FG-1")
+        pegging.add("RM-A", ("BOM-FG-1",), 6)
+        pegging.set_po_item("po-row-2", "FG-2")
+        pegging.add("RM-A", ("BOM-FG-2", "BOM-SUB"), 2)
+
+        # RM-A was split over two warehouses by the stock allocation
+        mr_items = [
+            {"item_code": "RM-A", "quantity": 6, "from_warehouse": "WH-1"},
+            {"item_code": "RM-A", "quantity": 2, "from_warehouse": "WH-2"},
+            {"item_code": "RM-B", "quantity": 1},
+        ]
+        set_mr_item_pegging(mr_items, pegging)
+
+        self.assertEqual(
+            json.loads(mr_items[1]["pegging"]),
+            [
+                ["po-row-1", "FG-1", "BOM-FG-1", 1.5],
+                ["po-row-2", "FG-2", "BOM-FG-2 > BOM-SUB", 0.5],
+            ],
+        )
+        self.assertEqual(
+            sum(peg[3] for row in mr_items[:2] for peg in json.loads(row["pegging"])),
+            8,
+        )
+        self.assertEqual(json.loads(mr_items[2]["pegging"]), [])
+
+    def test_saved_pegging_is_read_from_the_mr_rows(self):
+        mr_items = [
+            frappe._dict(
+                name="mr-row-1",
+                item_code="RM-A",
+                pegging=json.dumps([["po-row-1", "FG", "BOM-FG", 4]]),
+            ),
+            frappe._dict(name="mr-row-2", item_code="RM-B", pegging=None),
+        ]
+
+        with (
+            patch("frappe.db.delete"),
+            patch("frappe.db.bulk_insert") as bulk_insert,
+            patch("frappe.generate_hash", return_value="hash"),
+        ):
+            save_material_pegging("PM-0001", mr_items)
+
+        (values,) = [call.args[2] for call in bulk_insert.call_args_list]
+        self.assertEqual(
+            [row[1:8] for row in values],
+            [("PM-0001", "RM-A", 4, "mr-row-1", "po-row-1", "FG", "BOM-FG")],
+        )
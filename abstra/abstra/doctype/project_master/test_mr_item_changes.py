@@ -0,0 +1,72 @@
+# Copyright (c) 2026, Abdul Mannan and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from abstra.abstra.doctype.project_master.project_master import (
+    diff_mr_items,
+    split_sfa_mr_items,
+)
+
+
+def mr_row(item_code, quantity, name=None, **kwargs):
+    return frappe._dict(
+        name=name,
+        item_code=item_code,
+        warehouse="Stores",
+        material_request_type="Purchase",
+        quantity=quantity,
+        **kwargs,
+    )
+
+
+class TestMRItemChanges(FrappeTestCase):
+    def test_only_changed_rows_are_returned(self):
+        existing = [
+            mr_row("RM-A", 5, name="row-a"),
+            mr_row("RM-B", 2, name="row-b"),
+            mr_row("RM-C", 1, name="row-c"),
+        ]
+        new_items = [mr_row("RM-A", 5.0000001), mr_row("RM-B", 3), mr_row("RM-D", 4)]
+
+        changes = diff_mr_items(existing, new_items)
+
+        self.assertEqual(changes["update"], [{"name": "row-b", "quantity": 3}])
+        self.assertEqual([d.item_code for d in changes["insert"]], ["RM-D"])
+        self.assertEqual(changes["delete"], ["row-c"])
+
+    def test_rows_sharing_a_key_are_paired_in_order(self):
+        existing = [mr_row("RM-A", 1, name="row-1"), mr_row("RM-A", 2, name="row-2")]
+
+        changes = diff_mr_items(existing, [mr_row("RM-A", 1)])
+
+        self.assertEqual(changes, {"insert": [], "update": [], "delete": ["row-2"]})
+
+    def test_sfa_items_are_moved_out_before_the_diff(self):
+        new_items = [
+            mr_row("SFA-A", 2, item_name="SFA A", required_bom_qty=2),
+            mr_row("RM-B", 1),
+            mr_row("RM-B", 3),
+        ]
+        with patch(
+            "abstra.abstra.doctype.project_master.project_master.classify_sfa_items",
+            side_effect=lambda mr_items, po_items: (
+                [(mr_items[0], "FG")],
+                mr_items[1:],
+            ),
+        ):
+            mr_items, sub_assembly_items = split_sfa_mr_items(new_items, [])
+
+        self.assertEqual(
+            [(d["item_code"], d["quantity"]) for d in mr_items], [("RM-B", 1)]
+        )
+        self.assertEqual(
+            [(d["production_item"], d["parent_item_code"]) for d in sub_assembly_items],
+            [("SFA-A", "FG")],
+        )
+
+        changes = diff_mr_items([mr_row("RM-B", 1, name="row-b")], mr_items)
+        self.assertEqual(changes, {"insert": [], "update": [], "delete": []})
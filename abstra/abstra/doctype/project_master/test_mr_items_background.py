@@ -0,0 +1,54 @@
+# Copyright (c) 2026, Abdul Mannan and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from abstra.abstra.doctype.project_master.project_master import (
+    get_mr_items_dependency_versions,
+    get_mr_items_input_hash,
+)
+
+MODULE = "abstra.abstra.doctype.project_master.project_master"
+
+
+class TestMRItemsBackground(FrappeTestCase):
+    def test_input_hash_changes_with_dependency_versions(self):
+        doc = frappe._dict(name="PM-1", company="Co", po_items=[])
+        versions = {"BOM": {"BOM-FG": "2026-10-17 10:00"}, "Bin": {}}
+
+        before = get_mr_items_input_hash(doc, ["WH-1"], versions)
+        after = get_mr_items_input_hash(
+            doc, ["WH-1"], {**versions, "Bin": {"RM-A": "2026-10-17 11:00"}}
+        )
+
+        self.assertEqual(before, get_mr_items_input_hash(doc, ["WH-1"], versions))
+        self.assertNotEqual(before, after)
+
+    def test_dependency_versions_cover_the_bom_trees(self):
+        doc = frappe._dict(
+            po_items=[{"item_code": "FG", "bom_no": "BOM-FG"}],
+            sub_assembly_items=[{"production_item": "SUB", "bom_no": "BOM-SUB"}],
+        )
+        bom_children = {
+            "BOM-FG": [frappe._dict(item_code="SUB")],
+            "BOM-SUB": [frappe._dict(item_code="RM-A")],
+        }
+
+        with (
+            patch(f"{MODULE}.explode_bom_trees", return_value=bom_children) as explode,
+            patch(f"{MODULE}.get_dependency_versions", return_value={}) as get_versions,
+            patch(f"{MODULE}.get_bin_versions", return_value={"RM-A": "t"}) as bins,
+        ):
+            versions = get_mr_items_dependency_versions(doc)
+
+        explode.assert_called_once_with(["BOM-FG", "BOM-SUB"])
+        (dependencies,) = get_versions.call_args.args
+        self.assertEqual(
+            list(dependencies),
+            [{"BOM": {"BOM-FG", "BOM-SUB"}, "Item": {"FG", "SUB", "RM-A"}}],
+        )
+        bins.assert_called_once_with({"FG", "SUB", "RM-A"})
+        self.assertEqual(versions["Bin"], {"RM-A": "t"})
@@ -0,0 +1,131 @@
+# Copyright (c) 2026, Abdul Mannan and Contributors
+# See license.txt
+
+import random
+import time
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from abstra.abstra.doctype.project_master.project_master import get_layout_weights
+from abstra.planning.nesting import nest_parts
+
+
+def random_parts(count, low, high, qty=lambda rng: 1, seed=7):
+    rng = random.Random(seed)
+    return {
+        key: (rng.randint(low, high), rng.randint(low, high), qty(rng))
+        for key in range(count)
+    }
+
+
+class TestNesting(FrappeTestCase):
+    def assertValidLayouts(self, layouts, sheet_length, sheet_width, spacing=0):
+        for layout in layouts:
+            placed = [
+                (p.x, p.y, p.x + p.length, p.y + p.width) for p in layout["placements"]
+            ]
+            for x, y, right, top in placed:
+                self.assertTrue(x >= 0 and y >= 0)
+                self.assertTrue(right <= sheet_length and top <= sheet_width)
+
+            # parts keep `spacing` between each other
+            placed.sort()
+            for idx, (_x, y, right, top) in enumerate(placed):
+                for other_x, other_y, _other_right, other_top in placed[idx + 1 :]:
+                    if other_x >= right + spacing:
+                        break
+                    self.assertTrue(
+                        other_y >= top + spacing or y >= other_top + spacing,
+                        "parts overlap",
+                    )
+
+            counts = {}
+            for placement in layout["placements"]:
+                counts[placement.key] = counts.get(placement.key, 0) + 1
+            self.assertEqual(counts, layout["counts"])
+
+    def assertQuantitiesConserved(self, parts, layouts, unplaced):
+        nested = dict(unplaced)
+        for layout in layouts:
+            for key, count in layout["counts"].items():
+                nested[key] = nested.get(key, 0) + count * layout["sheets"]
+
+        self.assertEqual(nested, {key: qty for key, (_l, _w, qty) in parts.items()})
+
+    def test_layouts_stay_on_the_sheet_without_overlaps(self):
+        parts = random_parts(300, 20, 400, qty=lambda rng: rng.choice([1, 2, 7]))
+
+        layouts, unplaced = nest_parts(parts, 2500, 1250, spacing=5)
+
+        self.assertEqual(unplaced, {})
+        self.assertValidLayouts(layouts, 2500, 1250, spacing=5)
+        self.assertQuantitiesConserved(parts, layouts, unplaced)
+
+    def test_identical_parts_repeat_one_layout(self):
+        parts = {"A": (100, 50, 1000)}
+
+        layouts, unplaced = nest_parts(parts, 1000, 500)
+
+        self.assertEqual(
+            [(layout["counts"], layout["sheets"]) for layout in layouts],
+            [({"A": 100}, 10)],
+        )
+        self.assertQuantitiesConserved(parts, layouts, unplaced)
+
+    def test_rotation_off_keeps_parts_upright(self):
+        parts = {"tall": (50, 200, 2), "small": (50, 50, 3)}
+
+        layouts, unplaced = nest_parts(parts, 200, 100, allow_rotation=False)
+
+        self.assertEqual(unplaced, {"tall": 2})
+        self.assertFalse(any(p.rotated for d in layouts for p in d["placements"]))
+        self.assertValidLayouts(layouts, 200, 100)
+        self.assertQuantitiesConserved(parts, layouts, unplaced)
+
+        layouts, unplaced = nest_parts(parts, 200, 100)
+
+        self.assertEqual(unplaced, {})
+        self.assertValidLayouts(layouts, 200, 100)
+
+    def test_parts_larger_than_the_sheet_are_unplaced(self):
+        parts = {"big": (300, 300, 2), "fits": (100, 100, 1)}
+
+        layouts, unplaced = nest_parts(parts, 250, 250)
+
+        self.assertEqual(unplaced, {"big": 2})
+        self.assertQuantitiesConserved(parts, layouts, unplaced)
+
+    def test_spacing_equal_to_the_sheet_edge(self):
+        parts = {"full": (100, 100, 2), "tiny": (1, 1, 3)}
+
+        layouts, unplaced = nest_parts(parts, 100, 100, spacing=100)
+
+        self.assertEqual(unplaced, {})
+        self.assertTrue(all(len(d["placements"]) == 1 for d in layouts))
+        self.assertValidLayouts(layouts, 100, 100, spacing=100)
+        self.assertQuantitiesConserved(parts, layouts, unplaced)
+
+    def test_thousands_of_distinct_parts_pack_within_budget(self):
+        # every sheet holds hundreds of different parts, nothing repeats
+        parts = random_parts(4000, 20, 120)
+
+        start = time.monotonic()
+        layouts, unplaced = nest_parts(parts, 2500, 1250, spacing=5)
+        elapsed = time.monotonic() - start
+
+        self.assertLess(elapsed, 10)
+        self.assertQuantitiesConserved(parts, layouts, unplaced)
+
+    def test_layout_weights_cannot_exceed_the_sheet(self):
+        layouts = [{"counts": {"a": 2, "b": 1}}, {"counts": {"b": 3}}]
+        part_weights = {"a": 1.5, "b": 2}
+
+        self.assertEqual(get_layout_weights(layouts, part_weights, 6), [5, 6])
+        # without a sheet weight only the area is known
+        self.assertEqual(get_layout_weights(layouts, part_weights, 0), [5, 6])
+
+        with patch("frappe.throw", side_effect=frappe.ValidationError):
+            with self.assertRaises(frappe.ValidationError):
+                get_layout_weights(layouts, part_weights, 5.5)
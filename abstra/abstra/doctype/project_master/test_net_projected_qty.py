@@ -0,0 +1,32 @@
+# Copyright (c) 2026, Abdul Mannan and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from abstra.planning.stock_netting import net_projected_qty
+
+
+def bin_row(warehouse, projected_qty):
+    return frappe._dict(warehouse=warehouse, projected_qty=projected_qty)
+
+
+class TestNetProjectedQty(FrappeTestCase):
+    def test_bins_are_drawn_down_in_order(self):
+        bins = [bin_row("WH-1", 3), bin_row("WH-2", 5)]
+
+        self.assertEqual(net_projected_qty(bins, 4), 0)
+        self.assertEqual([d.projected_qty for d in bins], [0, 4])
+
+    def test_stock_is_not_netted_twice(self):
+        bins = [bin_row("WH-1", 3)]
+
+        self.assertEqual(net_projected_qty(bins, 2), 0)
+        self.assertEqual(net_projected_qty(bins, 2), 1)
+        self.assertEqual(net_projected_qty(bins, 2), 2)
+
+    def test_negative_projected_qty_is_skipped(self):
+        bins = [bin_row("WH-1", -2), bin_row("WH-2", 1)]
+
+        self.assertEqual(net_projected_qty(bins, 3), 2)
+        self.assertEqual([d.projected_qty for d in bins], [-2, 0])
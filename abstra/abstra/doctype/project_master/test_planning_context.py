@@ -0,0 +1,44 @@
+# Copyright (c) 2026, Abdul Mannan and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from abstra.planning.context import PlanningContext
+
+ITEM = frappe._dict(
+    name="FG",
+    item_name="Finished Good",
+    description="Finished Good, painted",
+    stock_uom="Nos",
+    disabled=0,
+    end_of_life=None,
+)
+
+
+class TestPlanningContext(FrappeTestCase):
+    def get_item_details(self, default_bom):
+        context = PlanningContext("Co")
+        with (
+            patch.object(context, "get_item", return_value=ITEM),
+            patch.object(context, "get_default_bom", return_value=default_bom),
+            patch("frappe.msgprint") as msgprint,
+        ):
+            return context.get_item_details("FG"), msgprint
+
+    def test_item_details_carry_the_default_bom(self):
+        details, msgprint = self.get_item_details("BOM-FG")
+
+        self.assertEqual(details.bom_no, "BOM-FG")
+        self.assertEqual(details.stock_uom, "Nos")
+        msgprint.assert_not_called()
+
+    def test_item_without_default_bom_keeps_its_fields(self):
+        details, msgprint = self.get_item_details(None)
+
+        self.assertIsNone(details.bom_no)
+        self.assertEqual(details.stock_uom, "Nos")
+        self.assertEqual(details.description, "Finished Good, painted")
+        msgprint.assert_called_once()
@@ -0,0 +1,90 @@
+# Copyright (c) 2026, Abdul Mannan and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from abstra.planning.raw_materials import (
+    explode_raw_materials,
+    get_raw_material_rows,
+)
+
+
+def bom_item(item_code, stock_qty, bom_no=None):
+    return frappe._dict(
+        item_code=item_code,
+        stock_qty=stock_qty,
+        stock_uom="Nos",
+        bom_no=bom_no,
+        description=item_code,
+        source_warehouse=None,
+    )
+
+
+def rm_row(item_code, qty, bom_no=None):
+    return frappe._dict(item_code=item_code, qty=qty, bom_no=bom_no)
+
+
+class TestRawMaterials(FrappeTestCase):
+    def test_rows_are_grouped_by_item_and_drafts_are_skipped(self):
+        headers = {
+            "BOM-A": frappe._dict(item="FG", quantity=2, docstatus=1),
+            "BOM-DRAFT": frappe._dict(item="FG", quantity=1, docstatus=0),
+        }
+        with (
+            patch(
+                "abstra.planning.raw_materials.get_bom_headers", return_value=headers
+            ),
+            patch(
+                "abstra.planning.raw_materials.get_cached_bom_items",
+                side_effect=lambda bom_nos, headers: {
+                    bom_no: [bom_item("RM-A", 2), bom_item("RM-A", 4)]
+                    for bom_no in bom_nos
+                },
+            ) as get_cached_bom_items,
+            patch(
+                "abstra.planning.raw_materials.get_raw_material_item_details",
+                return_value={"RM-A": frappe._dict(item_code="RM-A")},
+            ),
+        ):
+            rows = get_raw_material_rows(["BOM-A", "BOM-DRAFT"], "_Test Company", 0)
+
+        self.assertEqual(get_cached_bom_items.call_args.args[0], ["BOM-A"])
+        self.assertEqual(list(rows), ["BOM-A"])
+        self.assertEqual([(d.item_code, d.qty) for d in rows["BOM-A"]], [("RM-A", 3)])
+
+    def test_each_depth_is_read_in_one_batch(self):
+        bom_rows = {
+            "BOM-FG": [rm_row("SUB-A", 2, "BOM-A"), rm_row("SUB-B", 1, "BOM-B")],
+            "BOM-A": [rm_row("RM-X", 3)],
+            "BOM-B": [rm_row("RM-X", 1), rm_row("SKIP", 1)],
+        }
+        calls = []
+
+        def get_raw_material_rows(bom_nos, company, include_non_stock_items):
+            calls.append(set(bom_nos))
+            return {bom_no: bom_rows[bom_no] for bom_no in bom_nos}
+
+        def get_sub_bom(row, qty):
+            if row.item_code == "SKIP":
+                return False
+            return row.bom_no
+
+        with patch(
+            "abstra.planning.raw_materials.get_raw_material_rows",
+            side_effect=get_raw_material_rows,
+        ):
+            raw_materials = explode_raw_materials(
+                {"BOM-FG": 2}, "_Test Company", 0, get_sub_bom, with_paths=True
+            )
+
+        self.assertEqual(calls, [{"BOM-FG"}, {"BOM-A", "BOM-B"}])
+        self.assertEqual(
+            sorted((d.item_code, d.qty, d.bom_path) for d in raw_materials),
+            [
+                ("RM-X", 2, ("BOM-FG", "BOM-B")),
+                ("RM-X", 12, ("BOM-FG", "BOM-A")),
+            ],
+        )
@@ -0,0 +1,75 @@
+# Copyright (c) 2026, Abdul Mannan and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from abstra.planning.sfa import classify_sfa_items, get_sfa_index, is_valid_sfa_item
+
+
+def creator_row(item_code, fg_item, custom_msf):
+    return frappe._dict(item_code=item_code, fg_item=fg_item, custom_msf=custom_msf)
+
+
+class TestSFA(FrappeTestCase):
+    def test_operation_list_is_matched_on_any_valid_operation(self):
+        valid_ops = frozenset({"Laser Cutting"})
+
+        self.assertTrue(is_valid_sfa_item("Bending, Laser Cutting ", valid_ops))
+        self.assertFalse(is_valid_sfa_item("Bending", valid_ops))
+        self.assertFalse(is_valid_sfa_item("", valid_ops))
+
+    def test_sfa_row_wins_over_an_earlier_plain_row(self):
+        with (
+            patch(
+                "abstra.planning.sfa.get_bom_creators",
+                return_value={"BOM-FG": "CREATOR-1"},
+            ),
+            patch(
+                "abstra.planning.sfa.get_bom_creator_items",
+                return_value={
+                    "CREATOR-1": [
+                        creator_row("PART-A", "FG", "Bending"),
+                        creator_row("PART-A", "SUB-X", "Laser Cutting"),
+                        creator_row("PART-A", "SUB-Y", "Laser Cutting"),
+                    ]
+                },
+            ),
+            patch(
+                "abstra.planning.sfa.get_valid_sfa_operations",
+                return_value=frozenset({"Laser Cutting"}),
+            ),
+        ):
+            index = get_sfa_index(["BOM-FG"])
+
+        self.assertEqual(index, {"BOM-FG": {"PART-A": ("SUB-X", True)}})
+
+    def test_mr_items_are_split_with_the_first_boms_fg_item(self):
+        sfa_index = {
+            "BOM-1": {"PART-A": ("FG-1", True), "RM-B": ("FG-1", False)},
+            "BOM-2": {"PART-A": ("FG-2", True), "RM-B": ("FG-2", True)},
+        }
+        po_items = [
+            frappe._dict(bom_no="BOM-1"),
+            frappe._dict(bom_no="BOM-2"),
+            frappe._dict(bom_no="BOM-1"),
+        ]
+        mr_items = [
+            frappe._dict(item_code="PART-A"),
+            frappe._dict(item_code="RM-B"),
+            frappe._dict(item_code="RM-C"),
+        ]
+
+        with patch(
+            "abstra.planning.sfa.get_sfa_index", return_value=sfa_index
+        ) as get_sfa_index_mock:
+            sfa_items, raw_materials = classify_sfa_items(mr_items, po_items)
+
+        get_sfa_index_mock.assert_called_once_with(["BOM-1", "BOM-2"])
+        self.assertEqual(
+            [(row.item_code, fg_item) for row, fg_item in sfa_items],
+            [("PART-A", "FG-1"), ("RM-B", "FG-2")],
+        )
+        self.assertEqual([row.item_code for row in raw_materials], ["RM-C"])
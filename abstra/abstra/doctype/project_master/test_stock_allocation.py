@@ -0,0 +1,64 @@
+# Copyright (c) 2026, Abdul Mannan and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from abstra.planning.stock_allocation import allocate_stock
+
+
+def mr_row(item_code, quantity, conversion_factor=1):
+    return dict(
+        item_code=item_code,
+        quantity=quantity,
+        conversion_factor=conversion_factor,
+        stock_uom="Nos",
+        uom="Box",
+        material_request_type="Purchase",
+    )
+
+
+class TestStockAllocation(FrappeTestCase):
+    def allocate(self, mr_items, bins, round_up=lambda row: False):
+        with (
+            patch("frappe.get_all", return_value=bins),
+            patch("frappe.get_precision", return_value=3),
+        ):
+            return allocate_stock(mr_items, ["WH-1", "WH-2"], round_up)
+
+    def test_stock_is_drawn_in_warehouse_priority_order(self):
+        bins = [
+            frappe._dict(item_code="RM-A", warehouse="WH-2", actual_qty=10),
+            frappe._dict(item_code="RM-A", warehouse="WH-1", actual_qty=3),
+        ]
+
+        allocated = self.allocate([mr_row("RM-A", 5)], bins)
+
+        self.assertEqual(
+            [(d["from_warehouse"], d["quantity"]) for d in allocated],
+            [("WH-1", 3), ("WH-2", 2)],
+        )
+
+    def test_stock_given_to_one_row_is_not_offered_again(self):
+        bins = [frappe._dict(item_code="RM-A", warehouse="WH-1", actual_qty=4)]
+
+        allocated = self.allocate([mr_row("RM-A", 3), mr_row("RM-A", 3)], bins)
+
+        self.assertEqual(
+            [(d["material_request_type"], d["quantity"]) for d in allocated],
+            [("Material Transfer", 3), ("Material Transfer", 1), ("Purchase", 2)],
+        )
+
+    def test_remainder_stays_in_purchase_uom_and_is_rounded_up(self):
+        bins = [frappe._dict(item_code="RM-A", warehouse="WH-1", actual_qty=5)]
+
+        allocated = self.allocate(
+            [mr_row("RM-A", 2, conversion_factor=5.5)], bins, round_up=lambda row: True
+        )
+
+        transfer, purchase = allocated
+        self.assertEqual((transfer["quantity"], transfer["uom"]), (5, "Nos"))
+        self.assertEqual(transfer["conversion_factor"], 1.0)
+        self.assertEqual(purchase["quantity"], 6 / 5.5)
@@ -0,0 +1,56 @@
+# Copyright (c) 2026, Abdul Mannan and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from abstra.planning.stock_netting import get_bin_snapshot, get_item_bins
+
+
+def bin_row(item_code, warehouse, projected_qty):
+    return frappe._dict(
+        item_code=item_code, warehouse=warehouse, projected_qty=projected_qty
+    )
+
+
+class TestStockNetting(FrappeTestCase):
+    def test_snapshot_is_keyed_by_item_and_warehouse(self):
+        rows = [bin_row("RM-A", "WH-1", 1), bin_row("RM-A", "WH-2", 2)]
+        with (
+            patch(
+                "abstra.planning.stock_netting.get_subtree_warehouses",
+                return_value=["WH-1", "WH-2"],
+            ) as get_subtree,
+            patch(
+                "abstra.planning.stock_netting.get_bin_rows", return_value=rows
+            ) as get_bin_rows,
+        ):
+            snapshot = get_bin_snapshot(["RM-A", "RM-A", None], "Co", "Stores")
+
+        get_subtree.assert_called_once_with("Stores", "Co")
+        get_bin_rows.assert_called_once_with(["RM-A"], ["WH-1", "WH-2"])
+        self.assertEqual(snapshot[("RM-A", "WH-2")].projected_qty, 2)
+        self.assertEqual(len(snapshot), 2)
+
+    def test_snapshot_without_warehouses_skips_the_query(self):
+        with (
+            patch(
+                "abstra.planning.stock_netting.get_company_warehouses",
+                return_value=[],
+            ),
+            patch("abstra.planning.stock_netting.get_bin_rows") as get_bin_rows,
+        ):
+            snapshot = get_bin_snapshot(["RM-A"], "Co")
+
+        self.assertEqual(snapshot, {})
+        get_bin_rows.assert_not_called()
+
+    def test_items_without_bins_get_an_empty_list(self):
+        snapshot = {("RM-A", "WH-1"): bin_row("RM-A", "WH-1", 1)}
+
+        bins = get_item_bins(snapshot, ["RM-A", "RM-B"])
+
+        self.assertEqual(bins["RM-B"], [])
+        self.assertEqual([d.warehouse for d in bins["RM-A"]], ["WH-1"])
@@ -0,0 +1,75 @@
+# Copyright (c) 2026, Abdul Mannan and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from abstra.abstra.doctype.project_master.project_master import (
+    get_raw_materials_of_sub_assembly_items,
+)
+
+
+def rm_row(item_code, qty, bom_no=None):
+    return frappe._dict(item_code=item_code, qty=qty, bom_no=bom_no)
+
+
+class TestSubAssemblyRawMaterials(FrappeTestCase):
+    def explode(self, bom_rows, root_qtys, planned, calls=None):
+        def get_raw_material_rows(bom_qtys, company, include_non_stock_items):
+            if calls is not None:
+                calls.append(set(bom_qtys))
+            return {bom_no: bom_rows[bom_no] for bom_no in bom_qtys}
+
+        item_details, exploded = {}, set()
+        with patch(
+            "abstra.abstra.doctype.project_master.project_master.get_raw_material_rows",
+            side_effect=get_raw_material_rows,
+        ):
+            for bom_no, qty in root_qtys:
+                get_raw_materials_of_sub_assembly_items(
+                    [],
+                    item_details,
+                    "_Test Company",
+                    bom_no,
+                    0,
+                    planned,
+                    planned_qty=qty,
+                    exploded=exploded,
+                )
+
+        return item_details
+
+    def test_shared_sub_assembly_is_exploded_once_with_its_planned_qty(self):
+        bom_rows = {
+            "BOM-FG": [rm_row("SUB-A", 1, "BOM-A"), rm_row("SUB-B", 1, "BOM-B")],
+            "BOM-A": [rm_row("SUB-C", 2, "BOM-C")],
+            "BOM-B": [rm_row("SUB-C", 3, "BOM-C"), rm_row("RM-X", 1)],
+            "BOM-C": [rm_row("RM-Y", 4)],
+        }
+        planned = {
+            ("SUB-A", "BOM-A"): 2,
+            ("SUB-B", "BOM-B"): 2,
+            ("SUB-C", "BOM-C"): 10,
+        }
+        calls = []
+
+        item_details = self.explode(bom_rows, [("BOM-FG", 2)], planned, calls)
+
+        self.assertEqual(calls, [{"BOM-FG"}, {"BOM-A", "BOM-B"}, {"BOM-C"}])
+        self.assertEqual(item_details["RM-X"].qty, 2)
+        self.assertEqual(item_details["RM-Y"].qty, 40)
+
+    def test_sub_assembly_shared_by_po_items_is_counted_once(self):
+        bom_rows = {
+            "BOM-FG1": [rm_row("SUB-C", 1, "BOM-C")],
+            "BOM-FG2": [rm_row("SUB-C", 1, "BOM-C")],
+            "BOM-C": [rm_row("RM-Y", 1)],
+        }
+        # the sub-assembly table already holds the demand of both FGs
+        planned = {("SUB-C", "BOM-C"): 2}
+
+        item_details = self.explode(bom_rows, [("BOM-FG1", 1), ("BOM-FG2", 1)], planned)
+
+        self.assertEqual(item_details["RM-Y"].qty, 2)
@@ -0,0 +1,25 @@
+# Copyright (c) 2026, Abdul Mannan and Contributors
+# See license.txt
+
+from frappe.tests.utils import FrappeTestCase
+
+from abstra.planning.sub_assembly_row import SubAssemblyRow
+
+
+class TestSubAssemblyRow(FrappeTestCase):
+    def test_tuple_round_trip_keeps_every_field(self):
+        row = SubAssemblyRow(production_item="SUB-A", bom_no="BOM-A", qty=2, idx=1)
+
+        copy = SubAssemblyRow.from_tuple(row.as_tuple())
+
+        self.assertEqual(
+            copy.as_dict(),
+            {"production_item": "SUB-A", "bom_no": "BOM-A", "qty": 2, "idx": 1},
+        )
+
+    def test_bad_values_are_rejected(self):
+        with self.assertRaises(TypeError):
+            SubAssemblyRow(*range(len(SubAssemblyRow.__slots__) + 1))
+
+        with self.assertRaises(TypeError):
+            SubAssemblyRow(production_itme="SUB-A")
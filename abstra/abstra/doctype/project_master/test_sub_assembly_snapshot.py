@@ -0,0 +1,50 @@
+# Copyright (c) 2026, Abdul Mannan and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from abstra.abstra.doctype.project_master.project_master import (
+    get_dependency_versions,
+    is_dependency_current,
+)
+
+
+class TestSubAssemblySnapshot(FrappeTestCase):
+    def test_versions_are_read_once_per_doctype(self):
+        def get_all(doctype, filters, fields):
+            return [
+                frappe._dict(name=name, modified=f"{doctype}-{name}")
+                for name in sorted(filters["name"][1])
+            ]
+
+        with patch("frappe.get_all", side_effect=get_all) as get_all_mock:
+            versions = get_dependency_versions(
+                [
+                    {"BOM": {"BOM-A"}, "Item": {"FG"}},
+                    {"BOM": {"BOM-A", "BOM-B"}, "Item": set()},
+                ]
+            )
+
+        self.assertEqual(get_all_mock.call_count, 2)
+        self.assertEqual(
+            versions,
+            {
+                "BOM": {"BOM-A": "BOM-BOM-A", "BOM-B": "BOM-BOM-B"},
+                "Item": {"FG": "Item-FG"},
+            },
+        )
+
+    def test_snapshot_is_stale_when_a_dependency_changed_or_vanished(self):
+        versions = {"BOM": {"BOM-A": "1"}, "Item": {"FG": "2"}}
+
+        self.assertTrue(
+            is_dependency_current(
+                {"BOM": {"BOM-A": "1"}, "Item": {"FG": "2"}}, versions
+            )
+        )
+        self.assertFalse(is_dependency_current({"BOM": {"BOM-A": "0"}}, versions))
+        self.assertFalse(is_dependency_current({"Item": {"GONE": "2"}}, versions))
+        self.assertFalse(is_dependency_current({"BOM": {"BOM-A": None}}, versions))
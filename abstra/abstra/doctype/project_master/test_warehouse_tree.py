@@ -0,0 +1,60 @@
+# Copyright (c) 2026, Abdul Mannan and Contributors
+# See license.txt
+
+from unittest.mock import MagicMock, patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from abstra.planning.warehouse_tree import (
+    get_company_warehouses,
+    get_subtree_warehouses,
+)
+
+# All Warehouses
+# ├── Stores
+# │   ├── Stores A
+# │   └── Stores B
+# └── Finished Goods
+WAREHOUSES = [
+    frappe._dict(name="All Warehouses", lft=1, rgt=10),
+    frappe._dict(name="Stores", lft=2, rgt=7),
+    frappe._dict(name="Stores A", lft=3, rgt=4),
+    frappe._dict(name="Stores B", lft=5, rgt=6),
+    frappe._dict(name="Finished Goods", lft=8, rgt=9),
+]
+
+
+class TestWarehouseTree(FrappeTestCase):
+    def setUp(self):
+        cache = MagicMock()
+        cache.hget.return_value = None
+        for patcher in (
+            patch("frappe.cache", return_value=cache),
+            patch("frappe.get_all", return_value=WAREHOUSES),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_subtree_is_the_slice_under_a_warehouse(self):
+        self.assertEqual(
+            get_subtree_warehouses("Stores", "_Test Company"),
+            ["Stores", "Stores A", "Stores B"],
+        )
+        self.assertEqual(
+            get_subtree_warehouses("Stores", "_Test Company", include_self=False),
+            ["Stores A", "Stores B"],
+        )
+        self.assertEqual(
+            get_subtree_warehouses("Finished Goods", "_Test Company"),
+            ["Finished Goods"],
+        )
+
+    def test_unknown_warehouse_has_no_subtree(self):
+        self.assertEqual(get_subtree_warehouses("Elsewhere", "_Test Company"), [])
+
+    def test_company_warehouses_are_in_tree_order(self):
+        self.assertEqual(
+            get_company_warehouses("_Test Company"),
+            [d.name for d in WAREHOUSES],
+        )
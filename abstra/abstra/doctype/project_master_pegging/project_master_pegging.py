@@ -0,0 +1,13 @@
+# Copyright (c) 2026, Abdul Mannan and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class ProjectMasterPegging(Document):
+    pass
+
+
+def on_doctype_update():
+    frappe.db.add_index("Project Master Pegging", ["project_master", "item_code"])
@@ -1,6 +1,8 @@
 import frappe
 from frappe.utils import flt
 
+from abstra.planning.bom_cache import get_bom_creator_headers, get_bom_creators
+
 
 @frappe.whitelist()
 def get_item_history(item_code):
@@ -46,15 +48,15 @@ def get_project_fg_items(project_master, project_qty=1, delivery_date=None):
         items = []
         project_qty = flt(project_qty)
 
+        bom_creators = get_bom_creators(row.bom_no for row in project_doc.po_items)
+        bom_creator_headers = get_bom_creator_headers(set(bom_creators.values()))
+
         for po_item in project_doc.po_items:
             rate = 0
 
-            bom_creator = frappe.db.get_value("BOM", po_item.bom_no, "bom_creator")
-            if bom_creator:
-                rate = (
-                    frappe.db.get_value("BOM Creator", bom_creator, "raw_material_cost")
-                    or 0
-                )
+            header = bom_creator_headers.get(bom_creators.get(po_item.bom_no))
+            if header:
+                rate = header.raw_material_cost or 0
 
             items.append(
                 {
@@ -148,6 +148,57 @@ doc_events = {
     "Production Plan": {
         "on_submit": "abstra.overrides.production_plan.on_submit",
     },
+    "BOM": {
+        "on_update": "abstra.planning.bom_cache.on_bom_change",
+        "on_submit": [
+            "abstra.planning.bom_cache.on_bom_change",
+            "abstra.planning.flattened_bom.on_bom_submit",
+        ],
+        "on_cancel": [
+            "abstra.planning.bom_cache.on_bom_change",
+            "abstra.planning.flattened_bom.on_bom_cancel",
+        ],
+        "on_update_after_submit": [
+            "abstra.planning.bom_cache.on_bom_change",
+            "abstra.planning.flattened_bom.on_bom_update_after_submit",
+        ],
+    },
+    "UOM": {
+        "on_update": "abstra.planning.uom.clear_whole_number_uoms",
+        "after_rename": "abstra.planning.uom.clear_whole_number_uoms",
+        "on_trash": "abstra.planning.uom.clear_whole_number_uoms",
+    },
+    "Item": {
+        "on_update": "abstra.planning.uom.clear_item_uom_conversions",
+        "after_rename": "abstra.planning.uom.clear_item_uom_conversions",
+        "on_trash": "abstra.planning.uom.clear_item_uom_conversions",
+    },
+    "Operation": {
+        "on_update": "abstra.planning.sfa.clear_valid_sfa_operations",
+        "after_rename": "abstra.planning.sfa.clear_valid_sfa_operations",
+        "on_trash": "abstra.planning.sfa.clear_valid_sfa_operations",
+    },
+    "Warehouse": {
+        "after_insert": "abstra.planning.warehouse_tree.clear_warehouse_tree_cache",
+        "on_update": "abstra.planning.warehouse_tree.clear_warehouse_tree_cache",
+        "after_rename": "abstra.planning.warehouse_tree.clear_warehouse_tree_cache",
+        "on_trash": "abstra.planning.warehouse_tree.clear_warehouse_tree_cache",
+    },
+    "BOM Creator": {
+        "on_update": [
+            "abstra.planning.bom_cache.on_bom_creator_change",
+            "abstra.planning.flattened_bom.on_bom_creator_change",
+        ],
+        "on_submit": [
+            "abstra.planning.bom_cache.on_bom_creator_change",
+            "abstra.planning.flattened_bom.on_bom_creator_change",
+        ],
+        "on_cancel": [
+            "abstra.planning.bom_cache.on_bom_creator_change",
+            "abstra.planning.flattened_bom.on_bom_creator_change",
+        ],
+        "on_trash": "abstra.planning.flattened_bom.on_bom_creator_trash",
+    },
 }
 
 # Scheduled Tasks
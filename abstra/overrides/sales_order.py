@@ -4,6 +4,11 @@ from frappe.utils import cint, nowdate, flt, add_days
 from frappe.email.doctype.email_template.email_template import get_email_template
 import json
 
+from abstra.planning.flattened_bom import (
+    ensure_flattened_boms,
+    get_flattened_requirements,
+)
+
 
 def on_submit(doc, method=None):
     """Hook called when Sales Order is submitted"""
@@ -180,6 +185,7 @@ def calculate_required_items(doc):
     """Calculate all required items from SO items and their BOMs"""
     print(f"   📋 Processing {len(doc.items)} Sales Order items...")
     required_items = {}
+    bom_qtys = {}
 
     for so_item in doc.items:
         item_code = so_item.item_code
@@ -201,23 +207,32 @@ def calculate_required_items(doc):
             )
             required_items[item_code] = required_items.get(item_code, 0) + qty
         else:
-            # Has BOM - explode and add components
-            print(f"   🏗️  BOM found: {bom_no}, exploding...")
-            frappe.logger().info(f"  BOM found: {bom_no}, exploding...")
-            bom_items = get_bom_items_as_dict(
-                bom_no, doc.company, qty=qty, fetch_exploded=True
+            bom_qtys[bom_no] = bom_qtys.get(bom_no, 0) + qty
+
+    if bom_qtys:
+        # Has BOM - read the raw materials of all BOMs from the flattened BOM table
+        print(f"   🏗️  Exploding {len(bom_qtys)} BOMs...")
+        frappe.logger().info(f"  Exploding BOMs: {list(bom_qtys)}")
+        unflattened = ensure_flattened_boms(bom_qtys)
+        bom_items = get_flattened_requirements(
+            {b: q for b, q in bom_qtys.items() if b not in unflattened},
+            stock_items_only=True,
+        )
+        # draft or inactive BOMs have no flattened rows, explode them live
+        for bom_no in unflattened:
+            for code, detail in get_bom_items_as_dict(
+                bom_no, doc.company, qty=bom_qtys[bom_no], fetch_exploded=True
+            ).items():
+                bom_items[code] = bom_items.get(code, 0) + detail["qty"]
+        print(f"   📊 BOM items found: {len(bom_items)}")
+        frappe.logger().info(f"  BOM items found: {len(bom_items)}")
+
+        for code, qty in bom_items.items():
+            required_items[code] = required_items.get(code, 0) + qty
+            print(f"     ➕ Added {code}: {qty} (total: {required_items[code]})")
+            frappe.logger().info(
+                f"    Added {code}: {qty} (total: {required_items[code]})"
             )
-            print(f"   📊 BOM items found: {len(bom_items)}")
-            frappe.logger().info(f"  BOM items found: {len(bom_items)}")
-
-            for code, detail in bom_items.items():
-                required_items[code] = required_items.get(code, 0) + detail["qty"]
-                print(
-                    f"     ➕ Added {code}: {detail['qty']} (total: {required_items[code]})"
-                )
-                frappe.logger().info(
-                    f"    Added {code}: {detail['qty']} (total: {required_items[code]})"
-                )
 
     return required_items
 
@@ -0,0 +1,7 @@
+import frappe
+
+
+def execute():
+    """Drop the unused Item low-level code field."""
+    if frappe.db.exists("Custom Field", "Item-custom_low_level_code"):
+        frappe.delete_doc("Custom Field", "Item-custom_low_level_code")
@@ -0,0 +1,214 @@
+import frappe
+from frappe.utils import cint
+
+BOM_CHILDREN_CACHE = "abstra_bom_children"
+BOM_CACHE_HITS = "abstra_bom_children_hits"
+BOM_CACHE_MISSES = "abstra_bom_children_misses"
+BOM_CREATOR_ITEMS_CACHE = "abstra_bom_creator_items"
+
+BOM_ITEM_FIELDS = [
+    "parent",
+    "idx",
+    "item_code",
+    "bom_no",
+    "qty",
+    "stock_qty",
+    "stock_uom",
+    "description",
+    "source_warehouse",
+    "do_not_explode",
+]
+
+BOM_CREATOR_ITEM_FIELDS = [
+    "parent",
+    "idx",
+    "item_code",
+    "fg_item",
+    "custom_msf",
+    "custom_blwt",
+    "qty",
+]
+
+
+def get_bom_headers(bom_nos):
+    """Return {bom_no: {item, quantity, docstatus, modified}} for the given BOMs."""
+    if not bom_nos:
+        return {}
+
+    return {
+        d.name: d
+        for d in frappe.get_all(
+            "BOM",
+            filters={"name": ("in", list(bom_nos))},
+            fields=["name", "item", "quantity", "docstatus", "modified"],
+        )
+    }
+
+
+def get_cached_bom_items(bom_nos, headers=None):
+    """Return {bom_no: [BOM Item rows ordered by idx]} served from redis.
+
+    A cached entry is only used while it carries the BOM's current
+    `modified`, so an edited BOM is never read stale even if the doc event
+    that clears it did not fire.
+    """
+    bom_nos = list({bom_no for bom_no in bom_nos if bom_no})
+    if headers is None:
+        headers = get_bom_headers(bom_nos)
+
+    cache = frappe.cache()
+    bom_items, missing = {}, []
+    for bom_no in bom_nos:
+        header = headers.get(bom_no)
+        if not header:
+            bom_items[bom_no] = []
+            continue
+
+        cached = cache.hget(BOM_CHILDREN_CACHE, bom_no)
+        if cached and cached.get("modified") == str(header.modified):
+            bom_items[bom_no] = [frappe._dict(row) for row in cached["rows"]]
+        else:
+            missing.append(bom_no)
+
+    _count(BOM_CACHE_HITS, len(bom_nos) - len(missing))
+    _count(BOM_CACHE_MISSES, len(missing))
+
+    if missing:
+        fetched = {bom_no: [] for bom_no in missing}
+        for row in frappe.get_all(
+            "BOM Item",
+            filters={"parent": ("in", missing), "parenttype": "BOM"},
+            fields=BOM_ITEM_FIELDS,
+            order_by="parent, idx",
+        ):
+            fetched[row.parent].append(row)
+
+        for bom_no, rows in fetched.items():
+            cache.hset(
+                BOM_CHILDREN_CACHE,
+                bom_no,
+                {"modified": str(headers[bom_no].modified), "rows": rows},
+            )
+            bom_items[bom_no] = rows
+
+    return bom_items
+
+
+def get_bom_creators(bom_nos):
+    """Return {bom_no: bom_creator} for the given BOMs made from a BOM Creator."""
+    bom_nos = list({bom_no for bom_no in bom_nos if bom_no})
+    if not bom_nos:
+        return {}
+
+    return dict(
+        frappe.get_all(
+            "BOM",
+            filters={"name": ("in", bom_nos), "bom_creator": ("is", "set")},
+            fields=["name", "bom_creator"],
+            as_list=True,
+        )
+    )
+
+
+def get_bom_creator_headers(bom_creators):
+    """Return {bom_creator: {modified, raw_material_cost}}."""
+    if not bom_creators:
+        return {}
+
+    return {
+        d.name: d
+        for d in frappe.get_all(
+            "BOM Creator",
+            filters={"name": ("in", list(bom_creators))},
+            fields=["name", "modified", "raw_material_cost"],
+        )
+    }
+
+
+def get_bom_creator_items(bom_creators, headers=None):
+    """Return {bom_creator: [BOM Creator Item projections ordered by idx]}.
+
+    Only the columns planning reads (item_code, fg_item, custom_msf,
+    custom_blwt, qty) are loaded, in one query for all uncached BOM
+    Creators, and kept in redis while the BOM Creator's `modified` matches.
+    """
+    bom_creators = list({name for name in bom_creators if name})
+    if headers is None:
+        headers = get_bom_creator_headers(bom_creators)
+
+    cache = frappe.cache()
+    creator_items, missing = {}, []
+    for name in bom_creators:
+        header = headers.get(name)
+        if not header:
+            creator_items[name] = []
+            continue
+
+        cached = cache.hget(BOM_CREATOR_ITEMS_CACHE, name)
+        if cached and cached.get("modified") == str(header.modified):
+            creator_items[name] = [frappe._dict(row) for row in cached["rows"]]
+        else:
+            missing.append(name)
+
+    if missing:
+        fetched = {name: [] for name in missing}
+        for row in frappe.get_all(
+            "BOM Creator Item",
+            filters={"parent": ("in", missing), "parenttype": "BOM Creator"},
+            fields=BOM_CREATOR_ITEM_FIELDS,
+            order_by="parent, idx",
+        ):
+            fetched[row.parent].append(row)
+
+        for name, rows in fetched.items():
+            cache.hset(
+                BOM_CREATOR_ITEMS_CACHE,
+                name,
+                {"modified": str(headers[name].modified), "rows": rows},
+            )
+            creator_items[name] = rows
+
+    return creator_items
+
+
+def clear_bom_cache(bom_nos=None):
+    cache = frappe.cache()
+    if bom_nos is None:
+        cache.delete_value(BOM_CHILDREN_CACHE)
+        return
+
+    for bom_no in bom_nos:
+        cache.hdel(BOM_CHILDREN_CACHE, bom_no)
+
+
+def _count(key, value):
+    if value:
+        cache = frappe.cache()
+        cache.incrby(cache.make_key(key), value)
+
+
+@frappe.whitelist()
+def get_bom_cache_stats():
+    cache = frappe.cache()
+    hits = cint(cache.get(cache.make_key(BOM_CACHE_HITS)))
+    misses = cint(cache.get(cache.make_key(BOM_CACHE_MISSES)))
+
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": (hits / (hits + misses)) if (hits + misses) else 0,
+        "cached_boms": len(cache.hkeys(BOM_CHILDREN_CACHE)),
+    }
+
+
+def on_bom_change(doc, method=None):
+    """doc_events hook for BOM: drop the cached child list of this BOM."""
+    clear_bom_cache([doc.name])
+
+
+def on_bom_creator_change(doc, method=None):
+    """doc_events hook for BOM Creator: drop its items and the child lists of its BOMs."""
+    frappe.cache().hdel(BOM_CREATOR_ITEMS_CACHE, doc.name)
+    clear_bom_cache(
+        frappe.get_all("BOM", filters={"bom_creator": doc.name}, pluck="name")
+    )
@@ -0,0 +1,138 @@
+import frappe
+
+from abstra.planning.bom_cache import get_bom_headers, get_cached_bom_items
+
+
+def get_bom_children_map(bom_nos):
+    """Return {bom_no: [child rows]} for all given BOMs.
+
+    Rows carry the same keys as erpnext's `bom.get_children` (value, expandable,
+    parent_bom_qty, ...) plus `parent_item_code`, ordered by BOM Item idx.
+    BOM Item rows come from the redis cache in `bom_cache`; only the BOM
+    headers and the item master fields are read per call.
+    """
+    bom_nos = list({bom_no for bom_no in bom_nos if bom_no})
+    children = {bom_no: [] for bom_no in bom_nos}
+    if not bom_nos:
+        return children
+
+    headers = get_bom_headers(bom_nos)
+    bom_items = get_cached_bom_items(bom_nos, headers)
+
+    item_codes = {row.item_code for rows in bom_items.values() for row in rows}
+    items = {}
+    if item_codes:
+        items = {
+            d.name: d
+            for d in frappe.get_all(
+                "Item",
+                filters={"name": ("in", list(item_codes))},
+                fields=[
+                    "name",
+                    "description",
+                    "stock_uom",
+                    "item_name",
+                    "is_sub_contracted_item",
+                ],
+            )
+        }
+
+    for bom_no, rows in bom_items.items():
+        header = headers.get(bom_no)
+        for row in rows:
+            item = items.get(row.item_code)
+            if not item:
+                continue
+
+            children[bom_no].append(
+                frappe._dict(
+                    {
+                        "item_code": row.item_code,
+                        "value": row.bom_no,
+                        "bom_no": row.bom_no,
+                        "stock_qty": row.stock_qty,
+                        "qty": row.qty,
+                        "description": item.description,
+                        "stock_uom": item.stock_uom,
+                        "item_name": item.item_name,
+                        "is_sub_contracted_item": item.is_sub_contracted_item,
+                        "parent_item_code": header.item,
+                        "parent_bom_qty": header.quantity,
+                        "do_not_explode": row.do_not_explode,
+                        "expandable": 0 if row.bom_no in ("", None) else 1,
+                    }
+                )
+            )
+
+    return children
+
+
+def explode_bom_tree(bom_no, bom_children=None):
+    """Load the whole BOM tree below `bom_no`, one batch per BOM level.
+
+    `bom_children` may be an existing map (from an earlier call); only BOMs
+    missing from it are fetched and it is updated in place.
+    """
+    return explode_bom_trees([bom_no], bom_children)
+
+
+def explode_bom_trees(bom_nos, bom_children=None):
+    """Load the trees below all `bom_nos` together, one batch per BOM level."""
+    if bom_children is None:
+        bom_children = {}
+
+    frontier = {bom_no for bom_no in bom_nos if bom_no} - set(bom_children)
+    while frontier:
+        level = get_bom_children_map(frontier)
+        bom_children.update(level)
+
+        frontier = {
+            row.value for rows in level.values() for row in rows if row.value
+        } - set(bom_children)
+
+    return bom_children
+
+
+def get_expandable_item_codes(bom_children):
+    return {
+        row.item_code
+        for rows in bom_children.values()
+        for row in rows
+        if row.expandable
+    }
+
+
+def get_unit_subtree(bom_no, bom_children, subtree_memo):
+    """Return the expandable rows below `bom_no` for one unit of the BOM.
+
+    Each entry is `(child, unit_qty, depth)` in depth-first order, matching
+    the order `get_sub_assembly_items` emits rows in. Subtrees are memoized
+    per BOM in `subtree_memo`, so a BOM repeated under many parents (or many
+    po_items) is walked once and only scaled afterwards.
+    """
+    if bom_no in subtree_memo:
+        return subtree_memo[bom_no]
+
+    # guard against a BOM that (indirectly) contains itself
+    subtree_memo[bom_no] = []
+
+    rows = []
+    for d in bom_children.get(bom_no, []):
+        if not d.expandable:
+            continue
+
+        unit_qty = d.stock_qty / d.parent_bom_qty
+        if unit_qty <= 0:
+            continue
+
+        rows.append((d, unit_qty, 0))
+        if d.value:
+            rows.extend(
+                (child, unit_qty * child_qty, depth + 1)
+                for child, child_qty, depth in get_unit_subtree(
+                    d.value, bom_children, subtree_memo
+                )
+            )
+
+    subtree_memo[bom_no] = rows
+    return rows
@@ -0,0 +1,178 @@
+import frappe
+from erpnext.stock.get_item_details import get_conversion_factor
+from frappe import _
+from frappe.utils import getdate, nowdate
+
+from abstra.planning.uom import get_uom_conversion_factors, get_whole_number_uoms
+
+ITEM_FIELDS = [
+    "name",
+    "item_name",
+    "description",
+    "item_group",
+    "stock_uom",
+    "purchase_uom",
+    "default_material_request_type",
+    "min_order_qty",
+    "safety_stock",
+    "is_stock_item",
+    "is_sub_contracted_item",
+    "variant_of",
+    "disabled",
+    "end_of_life",
+]
+
+
+class PlanningContext:
+    """Item master data of one planning run, loaded in bulk and served from dicts.
+
+    `load_items` reads Item, Item Default, Item Group defaults, default BOMs
+    and UOM Conversion Detail rows for all given item codes with one query
+    each; lookups for codes that were never loaded fall back to loading just
+    that code, so callers stay correct even if they miss a preload. UOM
+    conversions and whole-number UOMs are served from their redis caches in
+    `uom`.
+    """
+
+    def __init__(self, company):
+        self.company = company
+        self.items = {}
+        self.item_defaults = {}
+        self.item_group_defaults = {}
+        self.default_boms = {}
+        self.uom_conversion_factors = {}
+        self.whole_number_uoms = None
+
+    def load_items(self, item_codes):
+        item_codes = {code for code in item_codes if code} - set(self.items)
+        if not item_codes:
+            return self
+
+        items = frappe.get_all(
+            "Item", filters={"name": ("in", list(item_codes))}, fields=ITEM_FIELDS
+        )
+        for code in item_codes:
+            self.items[code] = None
+        for item in items:
+            self.items[item.name] = item
+
+        # variants fall back to the BOM and UOM conversions of their template
+        parents = item_codes | {item.variant_of for item in items if item.variant_of}
+
+        for d in frappe.get_all(
+            "Item Default",
+            filters={
+                "parent": ("in", list(item_codes)),
+                "parenttype": "Item",
+                "company": self.company,
+            },
+            fields=["*"],
+        ):
+            self.item_defaults[d.parent] = d
+
+        item_groups = {item.item_group for item in items if item.item_group} - set(
+            self.item_group_defaults
+        )
+        if item_groups:
+            for item_group in item_groups:
+                self.item_group_defaults[item_group] = frappe._dict()
+            for d in frappe.get_all(
+                "Item Default",
+                filters={
+                    "parent": ("in", list(item_groups)),
+                    "parenttype": "Item Group",
+                    "company": self.company,
+                },
+                fields=["*"],
+            ):
+                d.pop("name", None)
+                self.item_group_defaults[d.parent] = d
+
+        for d in frappe.get_all(
+            "BOM",
+            filters={"item": ("in", list(parents)), "is_default": 1, "docstatus": 1},
+            fields=["name", "item"],
+        ):
+            self.default_boms[d.item] = d.name
+
+        self.uom_conversion_factors.update(get_uom_conversion_factors(parents))
+
+        return self
+
+    def get_item(self, item_code):
+        if item_code not in self.items:
+            self.load_items([item_code])
+
+        return self.items.get(item_code)
+
+    def get_item_default(self, item_code):
+        self.get_item(item_code)
+        return self.item_defaults.get(item_code) or frappe._dict()
+
+    def get_item_group_defaults(self, item_code):
+        """Same as erpnext's `get_item_group_defaults` for the context company."""
+        item = self.get_item(item_code)
+        if not item:
+            return frappe._dict()
+
+        return frappe._dict(self.item_group_defaults.get(item.item_group) or {})
+
+    def get_default_bom(self, item_code):
+        item = self.get_item(item_code)
+        if not item:
+            return None
+
+        return self.default_boms.get(item_code) or self.default_boms.get(
+            item.variant_of
+        )
+
+    def get_item_details(self, item_code):
+        """Item name, description, stock UOM and default BOM of an enabled item.
+
+        Like `work_order.get_item_details(item_code, throw=False)`: empty when
+        the item is disabled or past its end of life. Without a default BOM
+        the user is told so and `bom_no` is None.
+        """
+        item = self.get_item(item_code)
+        if (
+            not item
+            or item.disabled
+            or (item.end_of_life and getdate(item.end_of_life) <= getdate(nowdate()))
+        ):
+            return frappe._dict()
+
+        bom_no = self.get_default_bom(item_code)
+        if not bom_no:
+            frappe.msgprint(_("Default BOM for {0} not found").format(item_code))
+
+        return frappe._dict(
+            item_name=item.item_name,
+            description=item.description,
+            stock_uom=item.stock_uom,
+            bom_no=bom_no,
+        )
+
+    def get_uom_conversion_factor(self, item_code, uom):
+        """The item's own UOM Conversion Detail factor for `uom`, if any."""
+        self.get_item(item_code)
+        return self.uom_conversion_factors.get((item_code, uom))
+
+    def is_whole_number_uom(self, uom):
+        if self.whole_number_uoms is None:
+            self.whole_number_uoms = get_whole_number_uoms()
+
+        return uom in self.whole_number_uoms
+
+    def get_conversion_factor(self, item_code, uom):
+        """Same result as erpnext's `get_conversion_factor(...)["conversion_factor"]`."""
+        item = self.get_item(item_code)
+        conversion_factor = self.uom_conversion_factors.get((item_code, uom))
+        if not conversion_factor and item and item.variant_of:
+            conversion_factor = self.uom_conversion_factors.get((item.variant_of, uom))
+
+        if not conversion_factor:
+            conversion_factor = get_conversion_factor(item_code, uom).get(
+                "conversion_factor"
+            )
+
+        return conversion_factor or 1.0
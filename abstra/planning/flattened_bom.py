@@ -0,0 +1,303 @@
+from collections import defaultdict
+
+import frappe
+from frappe.query_builder import Case
+from frappe.query_builder.functions import Sum
+from frappe.utils import flt, now
+
+from abstra.planning.bom_explosion import explode_bom_tree, explode_bom_trees
+
+FLATTENED_BOM_FIELDS = [
+    "name",
+    "root_bom",
+    "bom_creator",
+    "root_item",
+    "item_code",
+    "bom_no",
+    "level",
+    "qty_per_unit",
+    "stock_uom",
+    "is_leaf",
+    "creation",
+    "modified",
+    "owner",
+    "modified_by",
+    "docstatus",
+]
+
+
+def get_bom_closure(bom_no, bom_children, closure_memo):
+    """Return {(item_code, bom_no, level, is_leaf, stock_uom): qty} per unit of `bom_no`.
+
+    Sub-BOMs are followed through BOM Item `bom_no` (skipping rows marked
+    `do_not_explode`), like erpnext's exploded items. Closures are memoized
+    per BOM so shared sub-assemblies are flattened once.
+    """
+    if bom_no in closure_memo:
+        return closure_memo[bom_no]
+
+    # guard against a BOM that (indirectly) contains itself
+    closure_memo[bom_no] = {}
+
+    closure = defaultdict(float)
+    for d in bom_children.get(bom_no, []):
+        unit_qty = d.stock_qty / (d.parent_bom_qty or 1)
+        explode = bool(d.value and not d.do_not_explode)
+
+        key = (
+            d.item_code,
+            d.value if explode else None,
+            0,
+            0 if explode else 1,
+            d.stock_uom,
+        )
+        closure[key] += unit_qty
+
+        if explode:
+            for (item_code, sub_bom, level, is_leaf, uom), qty in get_bom_closure(
+                d.value, bom_children, closure_memo
+            ).items():
+                closure[(item_code, sub_bom, level + 1, is_leaf, uom)] += unit_qty * qty
+
+    closure_memo[bom_no] = closure
+    return closure
+
+
+def update_flattened_bom(bom_no, bom_children=None, closure_memo=None):
+    """Rebuild the Flattened BOM Item rows of `bom_no` as a root BOM.
+
+    Only submitted, active BOMs keep rows; for any other BOM the rows are
+    just removed. A BOM with nothing to flatten keeps one marker row without
+    an item_code, so it is not taken for unflattened again. Returns whether
+    `bom_no` can be flattened.
+    """
+    frappe.db.delete("Flattened BOM Item", {"root_bom": bom_no})
+
+    bom = frappe.db.get_value(
+        "BOM", bom_no, ["item", "docstatus", "is_active"], as_dict=True
+    )
+    if not bom or bom.docstatus != 1 or not bom.is_active:
+        return False
+
+    bom_children = explode_bom_tree(bom_no, bom_children)
+    closure = get_bom_closure(
+        bom_no, bom_children, {} if closure_memo is None else closure_memo
+    )
+
+    # marker row of a BOM with nothing to flatten
+    insert_flattened_rows(
+        closure.items() or [((None, None, 0, 0, None), 0)], bom.item, root_bom=bom_no
+    )
+    return True
+
+
+def get_bom_creator_closure(creator_qty, rows):
+    """Return the flattened {key: qty} per unit of a BOM Creator.
+
+    Keys match `get_bom_closure` with no sub-BOM. `rows` are the creator's
+    BOM Creator Items; a row sits below the row named in its `fg_reference_id`,
+    or directly below the creator's item when that names no other row.
+    """
+    row_names = {row.name for row in rows}
+    children = defaultdict(list)
+    for row in rows:
+        parent = row.fg_reference_id if row.fg_reference_id in row_names else None
+        children[parent].append(row)
+
+    closure = defaultdict(float)
+    frontier = [(None, flt(creator_qty) or 1, 1.0, 0)]
+    visited = set()
+    while frontier:
+        next_frontier = []
+        for parent, parent_qty, factor, level in frontier:
+            if parent in visited:
+                continue
+            visited.add(parent)
+
+            for row in children.get(parent, []):
+                qty = factor * flt(row.stock_qty or row.qty) / parent_qty
+                is_leaf = 0 if children.get(row.name) else 1
+                closure[(row.item_code, None, level, is_leaf, row.stock_uom)] += qty
+                next_frontier.append((row.name, flt(row.qty) or 1, qty, level + 1))
+
+        frontier = next_frontier
+
+    return closure
+
+
+def update_flattened_bom_creator(bom_creator):
+    """Rebuild the Flattened BOM Item rows of a draft or submitted BOM Creator."""
+    frappe.db.delete("Flattened BOM Item", {"bom_creator": bom_creator})
+
+    header = frappe.db.get_value(
+        "BOM Creator", bom_creator, ["item_code", "qty", "docstatus"], as_dict=True
+    )
+    if not header or header.docstatus == 2:
+        return
+
+    rows = frappe.get_all(
+        "BOM Creator Item",
+        filters={"parent": bom_creator, "parenttype": "BOM Creator"},
+        fields=[
+            "name",
+            "item_code",
+            "fg_reference_id",
+            "qty",
+            "stock_qty",
+            "stock_uom",
+        ],
+        order_by="idx",
+    )
+    closure = get_bom_creator_closure(header.qty, rows)
+    insert_flattened_rows(closure.items(), header.item_code, bom_creator=bom_creator)
+
+
+def insert_flattened_rows(rows, root_item, root_bom=None, bom_creator=None):
+    """Bulk insert closure `rows` ((key, qty) pairs) under one root."""
+    timestamp, user = now(), frappe.session.user
+    values = [
+        (
+            frappe.generate_hash(length=10),
+            root_bom,
+            bom_creator,
+            root_item,
+            item_code,
+            sub_bom,
+            level,
+            qty,
+            stock_uom,
+            is_leaf,
+            timestamp,
+            timestamp,
+            user,
+            user,
+            0,
+        )
+        for (item_code, sub_bom, level, is_leaf, stock_uom), qty in rows
+    ]
+    if values:
+        frappe.db.bulk_insert("Flattened BOM Item", FLATTENED_BOM_FIELDS, values)
+
+
+def ensure_flattened_boms(bom_nos):
+    """Build the flattened rows of any of `bom_nos` that have none yet.
+
+    Returns the set of `bom_nos` that cannot be flattened (draft, cancelled
+    or inactive BOMs); their requirements have to be exploded live.
+    """
+    bom_nos = {bom_no for bom_no in bom_nos if bom_no}
+    if not bom_nos:
+        return set()
+
+    existing = set(
+        frappe.get_all(
+            "Flattened BOM Item",
+            filters={"root_bom": ("in", list(bom_nos))},
+            pluck="root_bom",
+            distinct=True,
+        )
+    )
+
+    missing = bom_nos - existing
+    unflattened = set()
+    if missing:
+        bom_children = explode_bom_trees(missing)
+        closure_memo = {}
+        for bom_no in missing:
+            if not update_flattened_bom(bom_no, bom_children, closure_memo):
+                unflattened.add(bom_no)
+
+    return unflattened
+
+
+def get_flattened_requirements(bom_qtys, leaves_only=True, stock_items_only=False):
+    """Return {item_code: qty} needed to make `bom_qtys` ({bom_no: qty}).
+
+    A single grouped query over Flattened BOM Item, whatever the depth or
+    number of the root BOMs.
+    """
+    bom_qtys = {bom_no: qty for bom_no, qty in bom_qtys.items() if bom_no and qty}
+    if not bom_qtys:
+        return {}
+
+    fb = frappe.qb.DocType("Flattened BOM Item")
+
+    root_qty = Case()
+    for bom_no, qty in bom_qtys.items():
+        root_qty = root_qty.when(fb.root_bom == bom_no, qty)
+
+    query = (
+        frappe.qb.from_(fb)
+        .select(fb.item_code, Sum(fb.qty_per_unit * root_qty).as_("qty"))
+        .where(fb.root_bom.isin(list(bom_qtys)) & fb.item_code.isnotnull())
+        .groupby(fb.item_code)
+    )
+
+    if leaves_only:
+        query = query.where(fb.is_leaf == 1)
+
+    if stock_items_only:
+        item = frappe.qb.DocType("Item")
+        query = (
+            query.join(item)
+            .on(item.name == fb.item_code)
+            .where(item.is_stock_item == 1)
+        )
+
+    return {d.item_code: d.qty for d in query.run(as_dict=True)}
+
+
+@frappe.whitelist()
+def rebuild_flattened_boms():
+    frappe.only_for("System Manager")
+    frappe.enqueue(
+        "abstra.planning.flattened_bom.rebuild_all_flattened_boms",
+        queue="long",
+        timeout=3600,
+        job_id="rebuild_flattened_boms",
+        deduplicate=True,
+    )
+
+
+def rebuild_all_flattened_boms():
+    bom_nos = frappe.get_all(
+        "BOM", filters={"docstatus": 1, "is_active": 1}, pluck="name"
+    )
+
+    frappe.db.delete("Flattened BOM Item")
+    bom_children = explode_bom_trees(bom_nos)
+    closure_memo = {}
+    for bom_no in bom_nos:
+        update_flattened_bom(bom_no, bom_children, closure_memo)
+
+    for bom_creator in frappe.get_all(
+        "BOM Creator", filters={"docstatus": ("<", 2)}, pluck="name"
+    ):
+        update_flattened_bom_creator(bom_creator)
+
+
+def on_bom_submit(doc, method=None):
+    update_flattened_bom(doc.name)
+
+
+def on_bom_cancel(doc, method=None):
+    frappe.db.delete("Flattened BOM Item", {"root_bom": doc.name})
+
+
+def on_bom_update_after_submit(doc, method=None):
+    """Activating/deactivating a BOM adds or drops its rows.
+
+    `is_default` is not a trigger: closures follow each BOM Item's own
+    `bom_no`, never the item's default BOM, so no row depends on it.
+    """
+    if doc.has_value_changed("is_active"):
+        update_flattened_bom(doc.name)
+
+
+def on_bom_creator_change(doc, method=None):
+    """doc_events hook for BOM Creator: re-flatten it, or drop it once cancelled."""
+    update_flattened_bom_creator(doc.name)
+
+
+def on_bom_creator_trash(doc, method=None):
+    frappe.db.delete("Flattened BOM Item", {"bom_creator": doc.name})
@@ -0,0 +1,210 @@
+from collections import namedtuple
+
+Placement = namedtuple("Placement", "key x y length width rotated")
+
+
+class MaxRectsSheet:
+    """One sheet packed with the MaxRects heuristic (best short side fit).
+
+    The free space is kept as a list of maximal free rectangles
+    (x, y, length, width) that may overlap. Every placement splits the free
+    rectangles it intersects; only the pieces cut off are checked for
+    containment, so a placement costs O(pieces x free rects) rather than a
+    re-prune of the whole list. The sizes of the free rectangles that no
+    other one dominates are kept too, so a part that fits nowhere is refused
+    by looking at a handful of sizes instead of searching the whole list.
+    `spacing` is kept between parts and is added to every part and to the
+    sheet, so parts may still touch the sheet edge.
+    """
+
+    def __init__(self, length, width, spacing=0, allow_rotation=True):
+        self.length = length
+        self.width = width
+        self.spacing = spacing
+        self.allow_rotation = allow_rotation
+        self.free_rects = [(0, 0, length + spacing, width + spacing)]
+        self.placements = []
+        self.used_area = 0
+        self.set_free_sizes()
+
+    def fits(self, length, width):
+        return (length <= self.length and width <= self.width) or (
+            self.allow_rotation and width <= self.length and length <= self.width
+        )
+
+    def insert(self, key, length, width):
+        """Place a `length` x `width` part, returns its Placement or None if full."""
+        if not self.has_room_for(length + self.spacing, width + self.spacing):
+            return None
+
+        best = self.find_position(length + self.spacing, width + self.spacing)
+        if not best:
+            return None
+
+        x, y, part_length, part_width, rotated = best
+        self.split_free_rects((x, y, part_length, part_width))
+
+        placement = Placement(
+            key,
+            x,
+            y,
+            width if rotated else length,
+            length if rotated else width,
+            rotated,
+        )
+        self.placements.append(placement)
+        self.used_area += length * width
+        return placement
+
+    def get_size(self, length, width):
+        # with rotation a part fits a rectangle in some orientation exactly
+        # when its short and long sides are within the rectangle's
+        if self.allow_rotation:
+            return (min(length, width), max(length, width))
+        return (length, width)
+
+    def set_free_sizes(self):
+        """Keep the free rectangle sizes not dominated by another one."""
+        self.free_sizes = []
+        max_second = -1
+        for first, second in sorted(
+            {self.get_size(r[2], r[3]) for r in self.free_rects}, reverse=True
+        ):
+            if second > max_second:
+                self.free_sizes.append((first, second))
+                max_second = second
+
+    def has_room_for(self, length, width):
+        first, second = self.get_size(length, width)
+        return any(first <= f and second <= s for f, s in self.free_sizes)
+
+    def find_position(self, length, width):
+        best, best_score = None, None
+        orientations = [(length, width, False)]
+        if self.allow_rotation and length != width:
+            orientations.append((width, length, True))
+
+        for free_x, free_y, free_length, free_width in self.free_rects:
+            for part_length, part_width, rotated in orientations:
+                if part_length > free_length or part_width > free_width:
+                    continue
+
+                left_length = free_length - part_length
+                left_width = free_width - part_width
+                score = (min(left_length, left_width), max(left_length, left_width))
+                if best_score is None or score < best_score:
+                    best_score = score
+                    best = (free_x, free_y, part_length, part_width, rotated)
+
+        return best
+
+    def split_free_rects(self, used):
+        used_x, used_y, used_length, used_width = used
+        used_right, used_top = used_x + used_length, used_y + used_width
+
+        kept, pieces = [], []
+        for rect in self.free_rects:
+            x, y, length, width = rect
+            right, top = x + length, y + width
+            if used_x >= right or used_right <= x or used_y >= top or used_top <= y:
+                kept.append(rect)
+                continue
+
+            if used_x > x:
+                pieces.append((x, y, used_x - x, width))
+            if used_right < right:
+                pieces.append((used_right, y, right - used_right, width))
+            if used_y > y:
+                pieces.append((x, y, length, used_y - y))
+            if used_top < top:
+                pieces.append((x, used_top, length, top - used_top))
+
+        # a piece lies inside a maximal rectangle that was cut, so it cannot
+        # contain one of the untouched rectangles; it only has to be checked
+        # against them and the other pieces
+        pieces = prune_free_rects(pieces)
+        self.free_rects = kept + [
+            piece for piece in pieces if not is_contained_in_any(piece, kept)
+        ]
+        self.set_free_sizes()
+
+
+def is_contained_in_any(rect, rects):
+    x, y, length, width = rect
+    right, top = x + length, y + width
+    return any(
+        x >= kx and y >= ky and right <= kx + k_length and top <= ky + k_width
+        for kx, ky, k_length, k_width in rects
+    )
+
+
+def prune_free_rects(rects):
+    """Drop the rectangles contained in another one (and duplicates)."""
+    # larger rectangles first, so a rectangle only has to be compared with
+    # the ones already kept
+    rects = sorted(set(rects), key=lambda r: r[2] * r[3], reverse=True)
+    kept = []
+    for rect in rects:
+        if not is_contained_in_any(rect, kept):
+            kept.append(rect)
+
+    return kept
+
+
+def nest_parts(parts, sheet_length, sheet_width, spacing=0, allow_rotation=True):
+    """Pack `parts` ({key: (length, width, qty)}) into identical sheets.
+
+    Parts are placed largest area first. Once a sheet is full its layout is
+    repeated for as many sheets as the remaining quantities allow, so a
+    project with thousands of identical parts is packed with a handful of
+    MaxRects runs. Returns (layouts, unplaced) where each layout is a dict
+    with `counts` ({key: parts per sheet}), `sheets` (times the layout is
+    cut), `used_area` (per sheet) and `placements`; `unplaced` holds
+    {key: qty} of the parts larger than the sheet.
+    """
+    remaining = {key: int(qty) for key, (_l, _w, qty) in parts.items() if qty > 0}
+    order = sorted(
+        remaining, key=lambda key: parts[key][0] * parts[key][1], reverse=True
+    )
+
+    probe = MaxRectsSheet(sheet_length, sheet_width, spacing, allow_rotation)
+    unplaced = {
+        key: remaining.pop(key)
+        for key in order
+        if not probe.fits(parts[key][0], parts[key][1])
+    }
+    order = [key for key in order if key in remaining]
+
+    layouts = []
+    while remaining:
+        sheet = MaxRectsSheet(sheet_length, sheet_width, spacing, allow_rotation)
+        counts = {}
+        for key in order:
+            length, width, _qty = parts[key]
+            while counts.get(key, 0) < remaining.get(key, 0):
+                if not sheet.insert(key, length, width):
+                    break
+                counts[key] = counts.get(key, 0) + 1
+
+        if not counts:
+            # only parts that need a spacing the sheet cannot give are left
+            unplaced.update(remaining)
+            break
+
+        sheets = min(remaining[key] // count for key, count in counts.items())
+        for key, count in counts.items():
+            remaining[key] -= count * sheets
+            if not remaining[key]:
+                del remaining[key]
+
+        order = [key for key in order if key in remaining]
+        layouts.append(
+            {
+                "counts": counts,
+                "sheets": sheets,
+                "used_area": sheet.used_area,
+                "placements": sheet.placements,
+            }
+        )
+
+    return layouts, unplaced
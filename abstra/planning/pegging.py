@@ -0,0 +1,127 @@
+import json
+from collections import defaultdict
+
+import frappe
+from frappe.utils import flt, now
+
+BOM_PATH_SEPARATOR = " > "
+
+PEGGING_FIELDS = [
+    "name",
+    "project_master",
+    "item_code",
+    "qty",
+    "mr_item",
+    "po_item",
+    "production_item",
+    "bom_path",
+    "creation",
+    "modified",
+    "owner",
+    "modified_by",
+    "docstatus",
+]
+
+
+class PeggingCollector:
+    """Collects (item, po_item, BOM path) -> qty while raw materials are planned."""
+
+    def __init__(self):
+        self.pegs = defaultdict(float)
+        self.po_item = None
+        self.production_item = None
+
+    def set_po_item(self, po_item, production_item):
+        self.po_item = po_item
+        self.production_item = production_item
+
+    def add(self, item_code, bom_path, qty):
+        if qty:
+            self.pegs[
+                (item_code, self.po_item, self.production_item, tuple(bom_path))
+            ] += qty
+
+
+def set_mr_item_pegging(mr_items, collector):
+    """Store `collector`'s pegs on the MR rows they were planned into.
+
+    Each row gets, as JSON in its `pegging` field, [po_item, production_item,
+    bom_path, qty] entries. The pegs of an item are shared out over its rows
+    in proportion to their quantity, so a row split across warehouses does
+    not count the requirement twice.
+    """
+    item_pegs = defaultdict(list)
+    for (item_code, po_item, production_item, bom_path), qty in collector.pegs.items():
+        item_pegs[item_code].append(
+            (po_item, production_item, BOM_PATH_SEPARATOR.join(bom_path), qty)
+        )
+
+    item_rows = defaultdict(list)
+    for row in mr_items:
+        item_rows[row["item_code"]].append(row)
+
+    for item_code, rows in item_rows.items():
+        total_qty = sum(flt(row.get("quantity")) for row in rows)
+        for row in rows:
+            share = flt(row.get("quantity")) / total_qty if total_qty else 1 / len(rows)
+            row["pegging"] = json.dumps(
+                [
+                    [po_item, production_item, bom_path, flt(qty * share, 6)]
+                    for po_item, production_item, bom_path, qty in item_pegs[item_code]
+                ]
+            )
+
+
+def save_material_pegging(project_master, mr_items):
+    """Replace the stored pegging of `project_master` with that of its MR rows."""
+    frappe.db.delete("Project Master Pegging", {"project_master": project_master})
+
+    timestamp, user = now(), frappe.session.user
+    values = [
+        (
+            frappe.generate_hash(length=10),
+            project_master,
+            row.item_code,
+            qty,
+            row.name,
+            po_item,
+            production_item,
+            bom_path,
+            timestamp,
+            timestamp,
+            user,
+            user,
+            0,
+        )
+        for row in mr_items
+        for po_item, production_item, bom_path, qty in json.loads(row.pegging or "[]")
+    ]
+
+    if values:
+        frappe.db.bulk_insert("Project Master Pegging", PEGGING_FIELDS, values)
+
+
+@frappe.whitelist()
+def get_material_pegging(project_master, item_code):
+    """Where the requirement of `item_code` in a Project Master comes from.
+
+    Reads the pegging recorded when Material Requests were last created:
+    one row per raw material row, assembly item row and BOM path, largest
+    first.
+    """
+    frappe.has_permission("Project Master", "read", project_master, throw=True)
+
+    rows = frappe.get_all(
+        "Project Master Pegging",
+        filters={"project_master": project_master, "item_code": item_code},
+        fields=["mr_item", "po_item", "production_item", "bom_path", "qty"],
+        order_by="qty desc",
+    )
+    for row in rows:
+        row.bom_path = row.bom_path.split(BOM_PATH_SEPARATOR) if row.bom_path else []
+
+    return {
+        "item_code": item_code,
+        "total_qty": sum(row.qty for row in rows),
+        "pegging": rows,
+    }
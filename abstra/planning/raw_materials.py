@@ -0,0 +1,151 @@
+from collections import defaultdict
+
+import frappe
+
+from abstra.planning.bom_cache import get_bom_headers, get_cached_bom_items
+
+
+def get_raw_material_rows(bom_nos, company, include_non_stock_items):
+    """Return {bom_no: [rows]}, one row per item_code of each BOM.
+
+    BOM Item rows come from the redis cache in `bom_cache`; the item master
+    fields of every item across all `bom_nos` are read in one join, so a
+    whole depth of a BOM tree costs the same few queries as a single BOM.
+    `qty` is per unit of the BOM. Only submitted BOMs yield rows.
+    """
+    bom_nos = list({bom_no for bom_no in bom_nos if bom_no})
+    headers = {
+        bom_no: header
+        for bom_no, header in get_bom_headers(bom_nos).items()
+        if header.docstatus == 1
+    }
+    bom_items = get_cached_bom_items(list(headers), headers)
+
+    items = get_raw_material_item_details(
+        {row.item_code for rows in bom_items.values() for row in rows},
+        company,
+        include_non_stock_items,
+    )
+
+    raw_materials = {}
+    for bom_no, rows in bom_items.items():
+        header = headers[bom_no]
+        grouped = {}
+        for row in rows:
+            item = items.get(row.item_code)
+            if not item:
+                continue
+
+            qty = (row.stock_qty or 0) / (header.quantity or 1)
+            if row.item_code in grouped:
+                grouped[row.item_code].qty += qty
+                continue
+
+            grouped[row.item_code] = frappe._dict(
+                item,
+                parent=bom_no,
+                qty=qty,
+                description=row.description,
+                stock_uom=row.stock_uom,
+                bom_no=row.bom_no,
+                source_warehouse=row.source_warehouse,
+                main_bom_item=header.item,
+            )
+
+        raw_materials[bom_no] = list(grouped.values())
+
+    return raw_materials
+
+
+def get_raw_material_item_details(item_codes, company, include_non_stock_items):
+    """Return {item_code: item master fields} used by material planning."""
+    if not item_codes:
+        return {}
+
+    item = frappe.qb.DocType("Item")
+    item_default = frappe.qb.DocType("Item Default")
+    item_uom = frappe.qb.DocType("UOM Conversion Detail")
+
+    data = (
+        frappe.qb.from_(item)
+        .left_join(item_default)
+        .on((item_default.parent == item.name) & (item_default.company == company))
+        .left_join(item_uom)
+        .on((item.name == item_uom.parent) & (item_uom.uom == item.purchase_uom))
+        .select(
+            item.name.as_("item_code"),
+            item.item_name,
+            item.default_material_request_type,
+            item.is_sub_contracted_item.as_("is_sub_contracted"),
+            item.default_bom,
+            item.min_order_qty,
+            item.safety_stock,
+            item.purchase_uom,
+            item_default.default_warehouse,
+            item_uom.conversion_factor,
+        )
+        .where(
+            item.name.isin(list(item_codes))
+            & (
+                item.is_stock_item.isin([0, 1])
+                if include_non_stock_items
+                else item.is_stock_item == 1
+            )
+        )
+    ).run(as_dict=True)
+
+    return {d.item_code: d for d in data}
+
+
+def add_to_item_details(item_details, rows):
+    """Accumulate `rows` into `item_details` ({item_code: row}) by item code."""
+    for row in rows:
+        if details := item_details.get(row.item_code):
+            details.qty += row.qty
+        else:
+            item_details[row.item_code] = row
+
+    return item_details
+
+
+def explode_raw_materials(
+    bom_qtys, company, include_non_stock_items, get_sub_bom, with_paths=False
+):
+    """Walk the BOM trees of `bom_qtys` ({bom_no: qty}) breadth first.
+
+    Each depth is one `get_raw_material_rows` call for all its BOMs, with
+    the quantities of the parents carried as a {(bom_no, path): qty}
+    mapping, so a BOM reached from several parents is read once per depth.
+    `get_sub_bom(row, qty)` returns the BOM to explode a row into, or
+    `False` to drop it, or `None` to keep it as a raw material. Returns the
+    raw material rows with `qty` for the whole of `bom_qtys`; with
+    `with_paths` each row also carries the `bom_path` (tuple of BOMs from
+    the root) it was reached through, and the same BOM reached through
+    different paths is kept apart.
+    """
+    frontier = {
+        (bom_no, (bom_no,) if with_paths else ()): qty
+        for bom_no, qty in bom_qtys.items()
+        if bom_no
+    }
+    raw_materials = []
+
+    while frontier:
+        bom_rows = get_raw_material_rows(
+            {bom_no for bom_no, _path in frontier}, company, include_non_stock_items
+        )
+
+        next_frontier = defaultdict(float)
+        for (bom_no, path), parent_qty in frontier.items():
+            for row in bom_rows.get(bom_no, []):
+                qty = row.qty * parent_qty
+                sub_bom = get_sub_bom(row, qty)
+                if sub_bom is None:
+                    raw_materials.append(frappe._dict(row, qty=qty, bom_path=path))
+                elif sub_bom:
+                    sub_path = (*path, sub_bom) if with_paths else ()
+                    next_frontier[(sub_bom, sub_path)] += qty
+
+        frontier = next_frontier
+
+    return raw_materials
@@ -0,0 +1,107 @@
+from functools import lru_cache
+
+import frappe
+
+from abstra.planning.bom_cache import get_bom_creator_items, get_bom_creators
+
+VALID_SFA_OPERATIONS_CACHE = "abstra_valid_sfa_operations"
+
+
+def get_valid_sfa_operations():
+    """Return the frozenset of Operations marked `custom_is_valid_for_sfa_item`.
+
+    Cached in redis until an Operation changes; an empty list is a cached
+    value too, so a site without SFA operations does not query every time.
+    """
+    cache = frappe.cache()
+    valid_ops = cache.get_value(VALID_SFA_OPERATIONS_CACHE)
+    if valid_ops is None:
+        valid_ops = frappe.get_all(
+            "Operation", filters={"custom_is_valid_for_sfa_item": 1}, pluck="name"
+        )
+        cache.set_value(VALID_SFA_OPERATIONS_CACHE, valid_ops)
+
+    return frozenset(valid_ops)
+
+
+@lru_cache(maxsize=4096)
+def parse_operations(operation_list):
+    """Return the operations of a comma separated `custom_msf` as a frozenset."""
+    if not operation_list:
+        return frozenset()
+
+    return frozenset(op.strip() for op in operation_list.split(",") if op.strip())
+
+
+def is_valid_sfa_item(operation_list, valid_ops=None):
+    """Whether any operation of the comma separated `operation_list` is valid for SFA."""
+    ops = parse_operations(operation_list)
+    if not ops:
+        return False
+
+    if valid_ops is None:
+        valid_ops = get_valid_sfa_operations()
+
+    return not ops.isdisjoint(valid_ops)
+
+
+def clear_valid_sfa_operations(doc=None, method=None, *args, **kwargs):
+    """doc_events hook for Operation."""
+    frappe.cache().delete_value(VALID_SFA_OPERATIONS_CACHE)
+
+
+def get_sfa_index(bom_nos):
+    """Return {bom_no: {item_code: (fg_item, is_sfa)}} from the BOMs' BOM Creators.
+
+    Every distinct BOM Creator is read once, from the projection cache in
+    `bom_cache`. An item listed several times in a BOM Creator maps to its
+    first SFA row, else to its first row.
+    """
+    bom_creators = get_bom_creators(bom_nos)
+    if not bom_creators:
+        return {}
+
+    valid_ops = get_valid_sfa_operations()
+    creator_index = {}
+    for bom_creator, rows in get_bom_creator_items(bom_creators.values()).items():
+        index = creator_index[bom_creator] = {}
+        for row in rows:
+            current = index.get(row.item_code)
+            if current and current[1]:
+                continue
+
+            is_sfa = is_valid_sfa_item(row.custom_msf, valid_ops)
+            if not current or is_sfa:
+                index[row.item_code] = (row.fg_item, is_sfa)
+
+    return {
+        bom_no: creator_index[bom_creator]
+        for bom_no, bom_creator in bom_creators.items()
+    }
+
+
+def classify_sfa_items(mr_items, po_items):
+    """Split `mr_items` into SFA sub-assemblies and plain raw materials.
+
+    Returns ([(mr_row, fg_item)], [mr_row]) in one pass over `mr_items`: a
+    row is an SFA sub-assembly when the BOM Creator of any po_item gives its
+    item a valid SFA operation, with the fg_item of the first such po_item.
+    """
+    bom_nos = list(dict.fromkeys(row.bom_no for row in po_items if row.bom_no))
+    sfa_index = get_sfa_index(bom_nos)
+
+    # item_code -> fg_item of the first BOM that makes it an SFA item
+    fg_items = {}
+    for bom_no in bom_nos:
+        for item_code, (fg_item, is_sfa) in sfa_index.get(bom_no, {}).items():
+            if is_sfa:
+                fg_items.setdefault(item_code, fg_item)
+
+    sfa_items, raw_materials = [], []
+    for row in mr_items:
+        if row.item_code in fg_items:
+            sfa_items.append((row, fg_items[row.item_code]))
+        else:
+            raw_materials.append(row)
+
+    return sfa_items, raw_materials
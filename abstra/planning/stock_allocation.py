@@ -0,0 +1,86 @@
+from collections import defaultdict
+
+import frappe
+from frappe.utils import ceil, flt
+
+
+def get_available_stock(item_codes, warehouses):
+    """Return {item_code: [[warehouse, qty]]} of stock on hand, in `warehouses` order.
+
+    One Bin query for all items; the order of `warehouses` is the priority
+    stock is drawn in.
+    """
+    item_codes = list({item_code for item_code in item_codes if item_code})
+    if not item_codes or not warehouses:
+        return {}
+
+    priority = {warehouse: idx for idx, warehouse in enumerate(warehouses)}
+    bins = frappe.get_all(
+        "Bin",
+        filters={
+            "item_code": ("in", item_codes),
+            "warehouse": ("in", list(priority)),
+            "actual_qty": (">", 0),
+        },
+        fields=["item_code", "warehouse", "actual_qty"],
+    )
+
+    available = defaultdict(list)
+    for row in sorted(bins, key=lambda row: priority[row.warehouse]):
+        available[row.item_code].append([row.warehouse, flt(row.actual_qty)])
+
+    return available
+
+
+def allocate_stock(mr_items, warehouses, round_up):
+    """Split MR rows into Material Transfers from `warehouses` and a remainder.
+
+    Stock is allocated greedily, warehouse by warehouse in priority order,
+    from one in-memory ledger, so stock given to one row is not offered to
+    the next row of the same item. Transfers are in stock UOM; whatever is
+    left stays on the original row, in its purchase UOM, rounded up when
+    `round_up(row)` says so.
+    """
+    available = get_available_stock(
+        [row.get("item_code") for row in mr_items], warehouses
+    )
+    precision = frappe.get_precision("Material Request Plan Item", "quantity")
+
+    allocated = []
+    for row in mr_items:
+        conversion_factor = row.get("conversion_factor") or 1
+        required_qty = row.get("quantity") * conversion_factor
+
+        for location in available.get(row.get("item_code"), []):
+            if required_qty <= 0:
+                break
+
+            warehouse, qty = location
+            if qty <= 0:
+                continue
+
+            quantity = min(qty, required_qty)
+            location[1] -= quantity
+            required_qty -= quantity
+
+            allocated.append(
+                dict(
+                    row,
+                    quantity=quantity,
+                    material_request_type="Material Transfer",
+                    # internal transfer should be in stock UOM
+                    uom=row.get("stock_uom"),
+                    from_warehouse=warehouse,
+                    conversion_factor=1.0,
+                )
+            )
+
+        # raise purchase request for remaining qty
+        if flt(required_qty, precision) > 0:
+            if round_up(row):
+                required_qty = ceil(required_qty)
+
+            row["quantity"] = required_qty / conversion_factor
+            allocated.append(row)
+
+    return allocated
@@ -0,0 +1,96 @@
+import frappe
+from frappe.query_builder.functions import IfNull, Sum
+
+from abstra.planning.warehouse_tree import (
+    get_company_warehouses,
+    get_subtree_warehouses,
+)
+
+
+def get_bin_snapshot(item_codes, company, warehouse=None):
+    """Return {(item_code, warehouse): bin row} for all `item_codes` at once.
+
+    Quantities are summed per item and warehouse over the company's
+    warehouses, or only those under `warehouse` when given, in one grouped
+    query. The warehouse scope is resolved from the cached warehouse tree.
+    Rows come in item/warehouse order and carry the same fields as
+    `get_bin_details` rows plus `item_code`.
+    """
+    item_codes = list({item_code for item_code in item_codes if item_code})
+    warehouses = (
+        get_subtree_warehouses(warehouse, company)
+        if warehouse
+        else get_company_warehouses(company)
+    )
+    if not item_codes or not warehouses:
+        return {}
+
+    rows = get_bin_rows(item_codes, warehouses)
+    return {(row.item_code, row.warehouse): row for row in rows}
+
+
+def get_bin_rows(item_codes, warehouses):
+    """Bin quantities of `item_codes` summed per item and warehouse."""
+    bin = frappe.qb.DocType("Bin")
+
+    return (
+        frappe.qb.from_(bin)
+        .select(
+            bin.item_code,
+            bin.warehouse,
+            IfNull(Sum(bin.projected_qty), 0).as_("projected_qty"),
+            IfNull(Sum(bin.actual_qty), 0).as_("actual_qty"),
+            IfNull(Sum(bin.ordered_qty), 0).as_("ordered_qty"),
+            IfNull(Sum(bin.reserved_qty_for_production), 0).as_(
+                "reserved_qty_for_production"
+            ),
+            IfNull(Sum(bin.planned_qty), 0).as_("planned_qty"),
+        )
+        .where((bin.item_code.isin(item_codes)) & (bin.warehouse.isin(warehouses)))
+        .groupby(bin.item_code, bin.warehouse)
+        .orderby(bin.item_code)
+        .orderby(bin.warehouse)
+    ).run(as_dict=True)
+
+
+def get_item_bins(bin_snapshot, item_codes=()):
+    """Regroup a bin snapshot as {item_code: [bin rows]}.
+
+    Every code in `item_codes` is present, with an empty list if it has no bin.
+    """
+    bins = frappe._dict({item_code: [] for item_code in item_codes})
+    for (item_code, _warehouse), row in bin_snapshot.items():
+        bins.setdefault(item_code, []).append(row)
+
+    return bins
+
+
+def get_projected_bins(item_codes, company, warehouse):
+    """Return {item_code: [bin rows]} for every item under `warehouse`.
+
+    The rows (one per warehouse) are used as the `bin_details` ledger of the
+    sub-assembly explosion. Items without any bin map to an empty list,
+    making every later lookup a dict hit.
+    """
+    if not warehouse:
+        return get_item_bins({}, item_codes)
+
+    return get_item_bins(get_bin_snapshot(item_codes, company, warehouse), item_codes)
+
+
+def net_projected_qty(bins, qty):
+    """Consume `qty` from the projected qty of `bins` and return what is left.
+
+    Bins are drawn down in order and keep the reduced projected qty, so the
+    same stock is never netted twice within one planning run.
+    """
+    for _bin_dict in bins:
+        if qty <= 0:
+            break
+
+        if _bin_dict.projected_qty > 0:
+            consumed = min(_bin_dict.projected_qty, qty)
+            _bin_dict.projected_qty -= consumed
+            qty -= consumed
+
+    return qty
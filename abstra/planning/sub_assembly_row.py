@@ -0,0 +1,62 @@
+class SubAssemblyRow:
+    """Compact record for one exploded sub-assembly row.
+
+    Used between explosion and the final `append("sub_assembly_items", ...)`
+    instead of a `frappe._dict` per node: slots keep rows small, and
+    `as_tuple`/`from_tuple` give a cheap form for caching.
+    """
+
+    __slots__ = (
+        "actual_qty",
+        "bom_level",
+        "bom_no",
+        "description",
+        "fg_warehouse",
+        "idx",
+        "indent",
+        "is_sub_contracted_item",
+        "item_name",
+        "parent_item_code",
+        "production_item",
+        "production_plan_item",
+        "qty",
+        "schedule_date",
+        "stock_qty",
+        "stock_uom",
+        "supplier",
+        "type_of_manufacturing",
+        "uom",
+    )
+
+    def __init__(self, *values, **kwargs):
+        if len(values) > len(self.__slots__):
+            raise TypeError(
+                f"Expected at most {len(self.__slots__)} sub assembly row values"
+            )
+
+        for field, value in zip(self.__slots__[: len(values)], values, strict=True):
+            setattr(self, field, value)
+
+        for field in self.__slots__[len(values) :]:
+            setattr(self, field, kwargs.pop(field, None))
+
+        if kwargs:
+            raise TypeError(f"Unknown sub assembly row fields: {', '.join(kwargs)}")
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def as_tuple(self):
+        return tuple(getattr(self, field) for field in self.__slots__)
+
+    @classmethod
+    def from_tuple(cls, values):
+        return cls(*values)
+
+    def as_dict(self):
+        """Child row values for `append`, leaving out unset fields."""
+        return {
+            field: value
+            for field in self.__slots__
+            if (value := getattr(self, field)) is not None
+        }
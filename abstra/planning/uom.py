@@ -0,0 +1,69 @@
+import frappe
+
+WHOLE_NUMBER_UOMS_CACHE = "abstra_whole_number_uoms"
+ITEM_UOM_CONVERSION_CACHE = "abstra_item_uom_conversions"
+
+
+def get_whole_number_uoms():
+    """Return the set of UOMs marked `must_be_whole_number`, cached in redis."""
+    cache = frappe.cache()
+    uoms = cache.get_value(WHOLE_NUMBER_UOMS_CACHE)
+    if uoms is None:
+        uoms = frappe.get_all("UOM", filters={"must_be_whole_number": 1}, pluck="name")
+        cache.set_value(WHOLE_NUMBER_UOMS_CACHE, uoms)
+
+    return frozenset(uoms)
+
+
+def is_whole_number_uom(uom, whole_number_uoms=None):
+    if whole_number_uoms is None:
+        whole_number_uoms = get_whole_number_uoms()
+
+    return uom in whole_number_uoms
+
+
+def get_uom_conversion_factors(item_codes):
+    """Return {(item_code, uom): conversion_factor} from the items' UOM Conversion Detail.
+
+    Each item's conversions are cached in redis as {uom: factor}; items not
+    cached yet are read together in one query.
+    """
+    cache = frappe.cache()
+    factors, missing = {}, []
+    for item_code in {item_code for item_code in item_codes if item_code}:
+        conversions = cache.hget(ITEM_UOM_CONVERSION_CACHE, item_code)
+        if conversions is None:
+            missing.append(item_code)
+            continue
+
+        for uom, conversion_factor in conversions.items():
+            factors[(item_code, uom)] = conversion_factor
+
+    if missing:
+        fetched = {item_code: {} for item_code in missing}
+        for d in frappe.get_all(
+            "UOM Conversion Detail",
+            filters={"parent": ("in", missing), "parenttype": "Item"},
+            fields=["parent", "uom", "conversion_factor"],
+        ):
+            fetched[d.parent][d.uom] = d.conversion_factor
+            factors[(d.parent, d.uom)] = d.conversion_factor
+
+        for item_code, conversions in fetched.items():
+            cache.hset(ITEM_UOM_CONVERSION_CACHE, item_code, conversions)
+
+    return factors
+
+
+def clear_whole_number_uoms(doc=None, method=None, *args, **kwargs):
+    """doc_events hook for UOM."""
+    frappe.cache().delete_value(WHOLE_NUMBER_UOMS_CACHE)
+
+
+def clear_item_uom_conversions(doc, method=None, *args, **kwargs):
+    """doc_events hook for Item: drop the cached conversions of the item."""
+    cache = frappe.cache()
+    cache.hdel(ITEM_UOM_CONVERSION_CACHE, doc.name)
+    if args:
+        # after_rename passes (old, new, merge)
+        cache.hdel(ITEM_UOM_CONVERSION_CACHE, args[0])
@@ -0,0 +1,57 @@
+from bisect import bisect_left, bisect_right
+
+import frappe
+
+WAREHOUSE_TREE_CACHE = "abstra_warehouse_tree"
+
+
+def get_warehouse_tree(company):
+    """Return the nested-set intervals of the company's warehouses.
+
+    `bounds` maps each warehouse to [lft, rgt]; `names` and `lfts` list the
+    warehouses ordered by lft, so every subtree is one contiguous slice found
+    by bisecting `lfts`. Kept in redis per company until a Warehouse changes.
+    """
+    cache = frappe.cache()
+    tree = cache.hget(WAREHOUSE_TREE_CACHE, company)
+    if tree is not None:
+        return tree
+
+    rows = frappe.get_all(
+        "Warehouse",
+        filters={"company": company},
+        fields=["name", "lft", "rgt"],
+        order_by="lft",
+    )
+    tree = {
+        "bounds": {row.name: [row.lft, row.rgt] for row in rows},
+        "names": [row.name for row in rows],
+        "lfts": [row.lft for row in rows],
+    }
+    cache.hset(WAREHOUSE_TREE_CACHE, company, tree)
+    return tree
+
+
+def get_subtree_warehouses(warehouse, company, include_self=True):
+    """Return `warehouse` (optionally) and all its descendants in `company`."""
+    tree = get_warehouse_tree(company)
+    if warehouse not in tree["bounds"]:
+        return []
+
+    lft, rgt = tree["bounds"][warehouse]
+    start = bisect_left(tree["lfts"], lft if include_self else lft + 1)
+    end = bisect_right(tree["lfts"], rgt)
+    return tree["names"][start:end]
+
+
+def get_company_warehouses(company):
+    return list(get_warehouse_tree(company)["names"])
+
+
+def clear_warehouse_tree_cache(doc=None, method=None, *args, **kwargs):
+    """doc_events hook for Warehouse.
+
+    Inserting, moving or deleting one warehouse renumbers lft/rgt across the
+    whole nested set, so the trees of all companies are dropped.
+    """
+    frappe.cache().delete_value(WAREHOUSE_TREE_CACHE)
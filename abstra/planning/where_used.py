@@ -0,0 +1,104 @@
+import frappe
+
+
+def get_flattened_usage(item_code):
+    """Flattened BOM Item rows of `item_code`, under root BOMs and BOM Creators."""
+    return frappe.get_all(
+        "Flattened BOM Item",
+        filters={"item_code": item_code},
+        fields=["root_bom", "bom_creator", "root_item", "level", "qty_per_unit"],
+        order_by="level",
+    )
+
+
+def get_where_used_rows(flattened_rows):
+    """Turn flattened rows into usage rows, sorted by document and level."""
+    rows = [
+        frappe._dict(
+            reference_doctype="BOM Creator" if row.bom_creator else "BOM",
+            reference_name=row.bom_creator or row.root_bom,
+            root_item=row.root_item,
+            level=row.level,
+            qty_per_unit=row.qty_per_unit,
+        )
+        for row in flattened_rows
+    ]
+    return sorted(rows, key=lambda d: (d.reference_doctype, d.reference_name, d.level))
+
+
+def get_documents_using_boms(boms):
+    """Return (project_masters, production_plans) that plan any of `boms`.
+
+    Only draft Production Plans are returned, as submitted ones are fixed.
+    """
+    if not boms:
+        return [], []
+
+    project_masters = frappe.get_all(
+        "Project Master Item",
+        filters={"bom_no": ("in", boms), "parenttype": "Project Master"},
+        pluck="parent",
+        distinct=True,
+    )
+
+    pp = frappe.qb.DocType("Production Plan")
+    pp_item = frappe.qb.DocType("Production Plan Item")
+    production_plans = (
+        frappe.qb.from_(pp_item)
+        .join(pp)
+        .on(pp.name == pp_item.parent)
+        .select(pp.name)
+        .distinct()
+        .where(pp_item.bom_no.isin(boms) & (pp.docstatus == 0))
+    ).run(pluck=True)
+
+    return project_masters, production_plans
+
+
+def get_permitted_names(doctype, names):
+    """The subset of `names` the session user can read, sorted."""
+    if not names:
+        return []
+
+    return sorted(
+        frappe.get_list(doctype, filters={"name": ("in", list(names))}, pluck="name")
+    )
+
+
+@frappe.whitelist()
+def get_where_used(item_code):
+    """Return everything that (transitively) consumes `item_code`.
+
+    BOMs and BOM Creators are both read from the Flattened BOM Item table;
+    Project Masters and draft Production Plans are then matched on the BOMs
+    found. Every document list is limited to what the user can read.
+    """
+    frappe.has_permission("BOM", "read", throw=True)
+
+    rows = get_where_used_rows(get_flattened_usage(item_code))
+
+    boms = get_permitted_names(
+        "BOM", {row.reference_name for row in rows if row.reference_doctype == "BOM"}
+    )
+    bom_creators = get_permitted_names(
+        "BOM Creator",
+        {row.reference_name for row in rows if row.reference_doctype == "BOM Creator"},
+    )
+    permitted = {("BOM", name) for name in boms} | {
+        ("BOM Creator", name) for name in bom_creators
+    }
+
+    project_masters, production_plans = get_documents_using_boms(boms)
+
+    return {
+        "item_code": item_code,
+        "usage": [
+            row
+            for row in rows
+            if (row.reference_doctype, row.reference_name) in permitted
+        ],
+        "boms": boms,
+        "bom_creators": bom_creators,
+        "project_masters": get_permitted_names("Project Master", project_masters),
+        "production_plans": get_permitted_names("Production Plan", production_plans),
+    }
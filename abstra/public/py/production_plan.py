@@ -2,6 +2,8 @@ from erpnext.manufacturing.doctype.production_plan.production_plan import Produc
 import frappe
 from frappe.utils.data import flt
 
+from abstra.planning.sfa import classify_sfa_items
+
 
 class ProductionPlanOverride(ProductionPlan):
     def add_so_in_table(self, open_so):
@@ -27,9 +29,6 @@ class ProductionPlanOverride(ProductionPlan):
 
     @frappe.whitelist()
     def remove_add_sfa_raw_material(self):
-
-        mr_items = self.get("mr_items") or []
-        po_items = self.get("po_items") or []
         sub_assembly_items = []
         remaining_mr_items = []
 
@@ -48,40 +47,30 @@ class ProductionPlanOverride(ProductionPlan):
                     poi.item_code, 0
                 ) + flt(poi.qty)
 
-        for po_item in po_items:
-            bom_doc = get_bom_details(po_item.bom_no)
-            if not bom_doc:
-                continue
-
-            for rmrow in mr_items:
-                matched_items = [
-                    x
-                    for x in bom_doc.items
-                    if x.item_code == rmrow.item_code
-                    and is_valid_sfa_item(x.custom_msf)
-                ]
-
-                ordered_qty = linked_po_items_map.get(rmrow.item_code, 0)
-                rmrow.ordered_qty = ordered_qty
-                rmrow.quantity = max((rmrow.quantity - ordered_qty), 0)
-
-                if matched_items:
-                    sub_assembly_items.append(
-                        {
-                            "production_item": rmrow.item_code,
-                            "item_name": rmrow.item_name,
-                            "qty": flt(rmrow.required_bom_qty),
-                            "type_of_manufacturing": "In House",
-                            "parent_item_code": matched_items[0].fg_item,
-                            "schedule_date": self.posting_date,
-                        }
-                    )
-                else:
-                    clean_row = rmrow.as_dict()
-                    for key in ("name", "idx", "parent", "parentfield", "parenttype"):
-                        clean_row.pop(key, None)
-                    clean_row["ordered_qty"] = ordered_qty
-                    remaining_mr_items.append(clean_row)
+        sfa_items, raw_materials = classify_sfa_items(
+            self.get("mr_items") or [], self.get("po_items") or []
+        )
+
+        for rmrow, fg_item in sfa_items:
+            sub_assembly_items.append(
+                {
+                    "production_item": rmrow.item_code,
+                    "item_name": rmrow.item_name,
+                    "qty": flt(rmrow.required_bom_qty),
+                    "type_of_manufacturing": "In House",
+                    "parent_item_code": fg_item,
+                    "schedule_date": self.posting_date,
+                }
+            )
+
+        for rmrow in raw_materials:
+            ordered_qty = linked_po_items_map.get(rmrow.item_code, 0)
+            clean_row = rmrow.as_dict()
+            for key in ("name", "idx", "parent", "parentfield", "parenttype"):
+                clean_row.pop(key, None)
+            clean_row["ordered_qty"] = ordered_qty
+            clean_row["quantity"] = max(flt(rmrow.quantity) - ordered_qty, 0)
+            remaining_mr_items.append(clean_row)
 
         self.set("mr_items", [])
         for rm in remaining_mr_items:
@@ -354,39 +343,6 @@ def get_status(project_qty, pending_qty):
         return "Pending"
 
 
-def get_bom_details(bom_item_code):
-    bom_creator_name = frappe.db.get_value("BOM", bom_item_code, "bom_creator")
-    if not bom_creator_name:
-        return None
-
-    try:
-        return frappe.get_doc("BOM Creator", bom_creator_name)
-    except frappe.DoesNotExistError:
-        return None
-
-
-def is_valid_sfa_item(operation_list):
-
-    if not operation_list:
-        return False
-
-    cache = frappe.cache()
-    valid_ops = cache.get_value("valid_sfa_operations")
-
-    if not valid_ops:
-        valid_ops = frappe.get_all(
-            "Operation", filters={"custom_is_valid_for_sfa_item": 1}, pluck="name"
-        )
-        valid_ops = set(valid_ops)
-        cache.set_value("valid_sfa_operations", list(valid_ops))
-
-    ops = [op.strip() for op in operation_list.split(",") if op.strip()]
-    if not ops:
-        return False
-
-    return any(op in valid_ops for op in ops)
-
-
 def clean_row_for_append(row):
     keys_to_remove = [
         "name",